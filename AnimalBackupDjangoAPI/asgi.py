@@ -13,4 +13,8 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'AnimalBackupDjangoAPI.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from animals.middleware import CancelOnDisconnectMiddleware  # noqa: E402
+
+application = CancelOnDisconnectMiddleware(django_application)
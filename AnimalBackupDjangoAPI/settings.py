@@ -41,6 +41,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'animals.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -123,6 +124,60 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Общий бюджет времени (в секундах) на один запрос к внешним API.
+# По истечении бюджета незавершенные запросы отменяются, а пользователь получает частичный результат
+ANIMALS_FETCH_BUDGET = 20
+ANIMALS_UPLOAD_BUDGET = 60
+
+# Места хранения резервных копий. Картинки загружаются во все места параллельно.
+# BACKEND: 'yandex' (токен из сессии), 'local' (ROOT - папка на диске),
+# 's3' (ENDPOINT_URL, BUCKET, ACCESS_KEY, SECRET_KEY, REGION - S3-совместимое хранилище).
+# NAME - уникальное имя места хранения в отчете (по умолчанию BACKEND)
+ANIMALS_STORAGE_TARGETS = [
+    {'BACKEND': 'yandex'},
+    # {'BACKEND': 'local', 'ROOT': BASE_DIR / 'backups'},
+    # {'BACKEND': 's3', 'ENDPOINT_URL': 'http://127.0.0.1:9000', 'BUCKET': 'animals',
+    #  'ACCESS_KEY': '...', 'SECRET_KEY': '...', 'REGION': 'us-east-1'},
+]
+
+# Обработка картинок перед загрузкой на Яндекс Диск (требуется Pillow).
+# QUALITY - качество JPEG/WebP, MAX_SIZE - максимальная сторона в пикселях (None - без уменьшения),
+# WEBP - перекодировать в WebP вместо JPEG,
+# BUDGET - бюджет времени на обработку (секунды), отсчитывается отдельно от ANIMALS_UPLOAD_BUDGET
+ANIMALS_IMAGE_PROCESSING = {
+    'ENABLED': False,
+    'QUALITY': 85,
+    'MAX_SIZE': 1600,
+    'WEBP': False,
+    'BUDGET': 15,
+}
+
+# Фоновая предзагрузка случайных картинок собак (animals.services.prefetch.DogPrefetcher).
+# Запускается при старте каждого процесса сервера (AnimalsConfig.ready), буферы у процессов свои.
+# BREEDS - популярные породы (подпороды предзагружаются автоматически),
+# BUFFER_SIZE - картинок в буфере на породу, MAX_BYTES - объем буферов одного процесса,
+# DIR - папка для хранения картинок на диске, у каждого процесса своя подпапка (None - в памяти),
+# REFILL_INTERVAL - период пополнения в секундах, CONCURRENCY - одновременных запросов к dog.ceo
+ANIMALS_DOG_PREFETCH = {
+    'ENABLED': False,
+    'BREEDS': ['hound', 'bulldog', 'retriever', 'terrier', 'spaniel', 'poodle'],
+    'BUFFER_SIZE': 3,
+    'MAX_BYTES': 50 * 1024 * 1024,
+    'DIR': None,
+    'REFILL_INTERVAL': 1.0,
+    'CONCURRENCY': 4,
+}
+
+# Профилирование запросов (animals.middleware.ProfilingMiddleware).
+# ENGINE - 'cprofile' или 'pyinstrument', SAMPLE_RATE - доля профилируемых запросов,
+# DIR - папка для файлов профилей
+ANIMALS_PROFILING = {
+    'ENABLED': False,
+    'ENGINE': 'cprofile',
+    'SAMPLE_RATE': 1.0,
+    'DIR': BASE_DIR / 'profiles',
+}
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -16,7 +16,7 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path
-from animals.views import index, save_token, cats_page, get_cat_image, upload_cat_to_disk, dogs_page, get_dog_image, upload_dog_to_disk
+from animals.views import index, save_token, cats_page, get_cat_image, upload_cat_to_disk, dogs_page, breeds_autocomplete, get_dog_image, upload_dog_to_disk
 urlpatterns = [
     path("", index, name="index"),
     path("save-token/", save_token, name="save_token"),
@@ -24,6 +24,7 @@ urlpatterns = [
     path("cats/get/", get_cat_image, name="get_cat_image"),
     path("cats/upload/", upload_cat_to_disk, name="upload_cat_to_disk"),
     path("dogs/", dogs_page, name="dogs_page"),
+    path("dogs/breeds/", breeds_autocomplete, name="breeds_autocomplete"),
     path("dogs/get/", get_dog_image, name="get_dog_image"),
     path("dogs/upload/", upload_dog_to_disk, name="upload_dog_to_disk"),
 ]
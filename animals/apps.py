@@ -1,6 +1,31 @@
+import os
+import sys
+from pathlib import Path
+
 from django.apps import AppConfig
+from django.conf import settings
+
+
+def _serves_requests() -> bool:
+    """
+    Обслуживает ли процесс запросы.
+    Команды manage.py (migrate, test, loadtest...) запросы не обслуживают, кроме runserver,
+    а у runserver с автоперезагрузкой запросы обслуживает дочерний процесс (RUN_MAIN=true)
+    """
+    if Path(sys.argv[0]).name != 'manage.py':
+        return True  # ASGI/WSGI-сервер: uvicorn, gunicorn, daphne
+    if sys.argv[1:2] != ['runserver']:
+        return False
+    return os.environ.get('RUN_MAIN') == 'true' or '--noreload' in sys.argv
 
 
 class AnimalsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'animals'
+
+    def ready(self):
+        # Предзагрузка запускается при старте процесса, а не при первом запросе
+        options = settings.ANIMALS_DOG_PREFETCH
+        if options.get('ENABLED') and _serves_requests():
+            from animals.services.prefetch import start_dog_prefetcher
+            start_dog_prefetcher(options)
@@ -0,0 +1,317 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.test import Client, override_settings
+
+from animals.services.breed_index import BreedIndex
+from animals.services.cats import Cats
+from animals.services.dogs import Dogs
+from animals.services.prefetch import start_dog_prefetcher, stop_dog_prefetcher
+from animals.services.yandex_disk import YandexDisk
+
+logger = logging.getLogger(__name__)
+
+# Набор запросов по умолчанию: один проход пользователя по котам и собакам
+DEFAULT_MIX = [
+    {'method': 'POST', 'path': '/save-token/', 'data': {'token': 'loadtest'}},
+    {'method': 'GET', 'path': '/cats/'},
+    {'method': 'POST', 'path': '/cats/get/', 'data': {'text': 'hello', 'path': 'loadtest/Cats'}},
+    {'method': 'POST', 'path': '/cats/upload/'},
+    {'method': 'GET', 'path': '/dogs/'},
+    {'method': 'GET', 'path': '/dogs/breeds/?q=hou'},
+    {'method': 'POST', 'path': '/dogs/get/', 'data': {'breed': 'hound'}},
+    {'method': 'POST', 'path': '/dogs/upload/'},
+]
+
+# Представления сообщают об ошибке редиректом, а не статусом ответа.
+# Успешный запрос записывает в сессию этот ключ; для загрузок в нем отчеты по местам хранения
+EXPECTED_SESSION_KEYS = {
+    '/save-token/': 'yadisk_token',
+    '/cats/get/': 'cat_image',
+    '/cats/upload/': 'cat_upload_reports',
+    '/dogs/get/': 'dog_main_image',
+    '/dogs/upload/': 'dog_upload_reports',
+}
+
+# Каталог пород локальной замены dog.ceo
+CATALOGUE = {
+    'hound': ['afghan', 'basset', 'blood'],
+    'bulldog': ['boston', 'english', 'french'],
+    'pug': [],
+}
+
+
+class UpstreamStandIn(threading.Thread):
+    """
+    Локальная замена dog.ceo, cataas.com, API Яндекс Диска и S3-совместимого хранилища.
+    Работает в отдельном потоке со своим event loop и отвечает с заданной задержкой.
+    """
+    def __init__(self, latency: float, image_size: int):
+        super().__init__(daemon=True)
+        self.latency = latency
+        self.image = b'\xff\xd8\xff\xe0' + os.urandom(image_size)
+        self.loop = asyncio.new_event_loop()
+        self.ready = threading.Event()
+        self.url = None
+        self.runner = None
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self._start())
+        self.ready.set()
+        self.loop.run_forever()
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    async def _start(self):
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_get('/dogs/breeds/list/all', self._breeds)
+        app.router.add_get('/dogs/breed/{breed}/list', self._sub_breeds)
+        app.router.add_get('/dogs/breed/{breed:.+}/images/random', self._random_image)
+        app.router.add_get('/images/{name}', self._image)
+        app.router.add_get('/cats/cat/says/{text}', self._image)
+        app.router.add_put('/disk/resources', self._create_folder)
+        app.router.add_get('/disk/resources/upload', self._upload_link)
+        app.router.add_put('/upload/{path:.+}', self._upload)
+        app.router.add_put('/s3/{bucket}/{key:.+}', self._s3_put_object)
+
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, '127.0.0.1', 0).start()
+        host, port = self.runner.addresses[0][:2]
+        self.url = f'http://{host}:{port}'
+
+    async def _breeds(self, request):
+        await asyncio.sleep(self.latency)
+        return web.json_response({'message': CATALOGUE})
+
+    async def _sub_breeds(self, request):
+        await asyncio.sleep(self.latency)
+        return web.json_response({'message': CATALOGUE.get(request.match_info['breed'], [])})
+
+    async def _random_image(self, request):
+        await asyncio.sleep(self.latency)
+        name = request.match_info['breed'].replace('/', '_')
+        return web.json_response({'message': f'{self.url}/images/{name}.jpg'})
+
+    async def _image(self, request):
+        await asyncio.sleep(self.latency)
+        return web.Response(body=self.image, content_type='image/jpeg')
+
+    async def _create_folder(self, request):
+        await asyncio.sleep(self.latency)
+        return web.json_response({}, status=201)
+
+    async def _upload_link(self, request):
+        await asyncio.sleep(self.latency)
+        return web.json_response({'href': f"{self.url}/upload/{request.query['path']}"})
+
+    async def _upload(self, request):
+        await request.read()
+        await asyncio.sleep(self.latency)
+        return web.Response(status=201)
+
+    async def _s3_put_object(self, request):
+        if not request.headers.get('Authorization', '').startswith('AWS4-HMAC-SHA256 '):
+            return web.Response(status=403)
+        await request.read()
+        await asyncio.sleep(self.latency)
+        return web.Response(status=200)
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест: воспроизводит набор запросов к приложению в несколько потоков. '
+        'Внешние API заменяются локальными заглушками.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('mix', nargs='?',
+                            help='JSONL-файл с запросами: {"method": ..., "path": ..., "data": {...}, '
+                                 '"expect": ключ сессии при успехе} на строку')
+        parser.add_argument('--concurrency', type=int, default=4, help='Количество одновременных клиентов')
+        parser.add_argument('--repeat', type=int, default=5, help='Сколько раз каждый клиент проходит набор запросов')
+        parser.add_argument('--latency', type=float, default=0.05, help='Задержка ответа заглушек, секунды')
+        parser.add_argument('--image-size', type=int, default=50_000, help='Размер картинок заглушек, байты')
+        parser.add_argument('--profile', action='store_true',
+                            help='Включить ProfilingMiddleware на время теста')
+        parser.add_argument('--prefetch', action='store_true',
+                            help='Включить фоновую предзагрузку картинок собак на время теста')
+        parser.add_argument('--targets',
+                            help='Места хранения через запятую: yandex, local, s3 (по умолчанию из настроек)')
+
+    def handle(self, *args, **options):
+        mix = self._load_mix(options['mix']) if options['mix'] else DEFAULT_MIX
+        self._check_migrations()
+
+        upstream = UpstreamStandIn(options['latency'], options['image_size'])
+        upstream.start()
+        upstream.ready.wait()
+
+        original_urls = Cats.base_url, Dogs.base_url, YandexDisk.base_url
+        Cats.base_url = f'{upstream.url}/cats'
+        Dogs.base_url = f'{upstream.url}/dogs'
+        YandexDisk.base_url = f'{upstream.url}/disk'
+        BreedIndex.reset()
+
+        overrides = {'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver']}
+        if options['profile']:
+            overrides['ANIMALS_PROFILING'] = {**getattr(settings, 'ANIMALS_PROFILING', {}), 'ENABLED': True}
+
+        local_root = None
+        try:
+            if options['targets']:
+                local_root = tempfile.mkdtemp(prefix='loadtest-')
+                overrides['ANIMALS_STORAGE_TARGETS'] = self._targets(options['targets'], upstream.url, local_root)
+            if options['prefetch']:
+                # AppConfig.ready() не запускает предзагрузку в командах manage.py
+                start_dog_prefetcher({**settings.ANIMALS_DOG_PREFETCH, 'BREEDS': list(CATALOGUE)})
+
+            with override_settings(**overrides):
+                started = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+                    futures = [
+                        executor.submit(self._run_client, mix, options['repeat'])
+                        for _ in range(options['concurrency'])
+                    ]
+                    samples = [sample for future in futures for sample in future.result()]
+                elapsed = time.perf_counter() - started
+        finally:
+            Cats.base_url, Dogs.base_url, YandexDisk.base_url = original_urls
+            BreedIndex.reset()
+            stop_dog_prefetcher()
+            upstream.stop()
+            if local_root:
+                shutil.rmtree(local_root, ignore_errors=True)
+
+        self._report(samples, elapsed)
+
+    @staticmethod
+    def _check_migrations():
+        """Сессии хранятся в базе: без примененных миграций все запросы завершились бы ошибкой"""
+        connection = connections[DEFAULT_DB_ALIAS]
+        executor = MigrationExecutor(connection)
+        if executor.migration_plan(executor.loader.graph.leaf_nodes()):
+            raise CommandError('Есть непримененные миграции, выполните python manage.py migrate')
+
+    @staticmethod
+    def _targets(names: str, upstream_url: str, local_root: str) -> list:
+        """Настройки мест хранения, направленные на заглушки и временную папку"""
+        available = {
+            'yandex': {'BACKEND': 'yandex'},
+            'local': {'BACKEND': 'local', 'ROOT': local_root},
+            's3': {'BACKEND': 's3', 'ENDPOINT_URL': f'{upstream_url}/s3', 'BUCKET': 'loadtest',
+                   'ACCESS_KEY': 'loadtest', 'SECRET_KEY': 'loadtest'},
+        }
+        targets = []
+        for name in names.split(','):
+            if name.strip() not in available:
+                raise CommandError(f'Неизвестное место хранения: {name}')
+            targets.append(available[name.strip()])
+        return targets
+
+    @staticmethod
+    def _load_mix(filename: str) -> list:
+        """Читает набор запросов из JSONL-файла"""
+        try:
+            with open(filename, encoding='utf-8') as file:
+                mix = [json.loads(line) for line in file if line.strip()]
+        except (OSError, json.JSONDecodeError) as e:
+            raise CommandError(f'Не удалось прочитать набор запросов {filename}: {e}')
+        if not mix:
+            raise CommandError(f'Набор запросов {filename} пуст')
+        return mix
+
+    @staticmethod
+    def _run_client(mix: list, repeat: int) -> list:
+        """
+        Один клиент со своей сессией проходит набор запросов repeat раз.
+        Запрос считается ошибкой, если ответ 4xx/5xx или в сессии не появился
+        ожидаемый результат (EXPECTED_SESSION_KEYS или "expect" в наборе запросов).
+        Сессия клиента удаляется после теста.
+        Возвращает список (метод и путь, успех, длительность)
+        """
+        client = Client()
+        samples = []
+        try:
+            for _ in range(repeat):
+                for entry in mix:
+                    method = entry.get('method', 'GET').upper()
+                    path = entry['path'].split('?')[0]
+                    key = f"{method} {path}"
+                    expected = entry.get('expect', EXPECTED_SESSION_KEYS.get(path) if method == 'POST' else None)
+                    start = time.perf_counter()
+                    try:
+                        if expected:
+                            # Результат прошлого прохода не должен засчитываться как успех
+                            session = client.session
+                            session.pop(expected, None)
+                            session.save()
+                            start = time.perf_counter()
+                        if method == 'POST':
+                            response = client.post(entry['path'], entry.get('data', {}))
+                        else:
+                            response = client.get(entry['path'], entry.get('data', {}))
+                        duration = time.perf_counter() - start
+                        ok = response.status_code < 400 and (not expected or Command._succeeded(client, expected))
+                    except Exception as e:
+                        logger.error(f"Ошибка при запросе {key}: {e}")
+                        duration = time.perf_counter() - start
+                        ok = False
+                    samples.append((key, ok, duration))
+        finally:
+            try:
+                client.session.delete()
+            except Exception as e:
+                logger.error(f"Не удалось удалить сессию нагрузочного теста: {e}")
+            connections.close_all()
+        return samples
+
+    @staticmethod
+    def _succeeded(client: Client, expected: str) -> bool:
+        """Появился ли в сессии ожидаемый результат; для загрузок - все ли файлы загружены"""
+        value = client.session.get(expected)
+        if not value:
+            logger.warning(f"Запрос не записал {expected} в сессию")
+            return False
+        if expected.endswith('_upload_reports'):
+            return all(not report['failed'] and report['json_uploaded'] for report in value.values())
+        return True
+
+    def _report(self, samples: list, elapsed: float):
+        """Выводит пропускную способность и задержки по каждому пути"""
+        by_path = defaultdict(list)
+        for key, ok, duration in samples:
+            by_path[key].append((ok, duration))
+
+        self.stdout.write(f'{"Запрос":<28} {"кол-во":>7} {"ошибки":>7} {"p50, мс":>9} {"p95, мс":>9} {"max, мс":>9}')
+        for key, entries in by_path.items():
+            durations = sorted(duration * 1000 for _, duration in entries)
+            errors = sum(1 for ok, _ in entries if not ok)
+            p95 = statistics.quantiles(durations, n=20, method='inclusive')[-1] if len(durations) > 1 else durations[0]
+            self.stdout.write(
+                f'{key:<28} {len(entries):>7} {errors:>7} '
+                f'{statistics.median(durations):>9.1f} {p95:>9.1f} {durations[-1]:>9.1f}'
+            )
+
+        errors = sum(1 for _, ok, _ in samples if not ok)
+        self.stdout.write(self.style.SUCCESS(
+            f'Всего запросов: {len(samples)}, ошибок: {errors}, '
+            f'время: {elapsed:.2f} с, {len(samples) / elapsed:.1f} запросов/с'
+        ))
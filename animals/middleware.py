@@ -0,0 +1,152 @@
+import asyncio
+import cProfile
+import logging
+import random
+import re
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilingMiddleware:
+    """
+    Профилирование запросов по настройкам ANIMALS_PROFILING.
+    Для каждого выбранного запроса сохраняет профиль в отдельный файл:
+    - cprofile: .prof (смотреть через snakeviz или pstats)
+    - pyinstrument: .html
+    До Python 3.12 cProfile видит только поток запроса, поэтому время корутин внутри
+    async_to_sync отображается как ожидание в async_to_sync.
+    Начиная с Python 3.12 cProfile работает через sys.monitoring, и одновременно
+    может профилироваться только один запрос: остальные пропускаются с предупреждением в лог.
+    pyinstrument показывает и время внутри корутин.
+    """
+    def __init__(self, get_response):
+        options = getattr(settings, 'ANIMALS_PROFILING', {})
+        if not options.get('ENABLED'):
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+        self.engine = options.get('ENGINE', 'cprofile')
+        self.sample_rate = options.get('SAMPLE_RATE', 1.0)
+        self.directory = Path(options.get('DIR', settings.BASE_DIR / 'profiles'))
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        if self.engine == 'pyinstrument':
+            try:
+                import pyinstrument  # noqa: F401
+            except ImportError:
+                raise ImproperlyConfigured("Для ENGINE='pyinstrument' установите pyinstrument")
+        elif self.engine != 'cprofile':
+            raise ImproperlyConfigured(f"Неизвестный ENGINE профилирования: {self.engine}")
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        if self.engine == 'pyinstrument':
+            return self._profile_pyinstrument(request)
+        return self._profile_cprofile(request)
+
+    def _filename(self, request, elapsed: float, extension: str) -> Path:
+        """Имя файла профиля: время, метод, путь и длительность запроса"""
+        path = re.sub(r'[^a-zA-Z0-9]+', '_', request.path).strip('_') or 'index'
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.method}-{path}-{elapsed * 1000:.0f}ms-{uuid.uuid4().hex[:6]}"
+        return self.directory / f'{name}.{extension}'
+
+    def _profile_cprofile(self, request):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Уже работает другой профилировщик (в Python 3.12+ - в любом потоке)
+            logger.warning(f"Профилирование {request.method} {request.path} пропущено: профилировщик уже занят")
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        elapsed = time.perf_counter() - start
+
+        filename = self._filename(request, elapsed, 'prof')
+        profiler.dump_stats(filename)
+        logger.info(f"Профиль {request.method} {request.path} сохранен в {filename}")
+        return response
+
+    def _profile_pyinstrument(self, request):
+        from pyinstrument import Profiler
+
+        profiler = Profiler()
+        start = time.perf_counter()
+        profiler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.stop()
+        elapsed = time.perf_counter() - start
+
+        filename = self._filename(request, elapsed, 'html')
+        filename.write_text(profiler.output_html(), encoding='utf-8')
+        logger.info(f"Профиль {request.method} {request.path} сохранен в {filename}")
+        return response
+
+
+class CancelOnDisconnectMiddleware:
+    """
+    ASGI-обертка над приложением Django: при отключении клиента отменяет обработку запроса.
+    Django 4.2 после чтения тела запроса больше не слушает receive и доводит
+    async-представление до конца, даже если ответ уже некому отправить.
+    Обертка дочитывает receive сама и при http.disconnect до отправки ответа
+    отменяет задачу запроса: CancelledError отменяет TaskGroup и запросы к API внутри представления.
+    Синхронные представления отменить нельзя, поэтому получение и загрузка картинок - async.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        body_received = asyncio.Event()
+        response_sent = False
+        disconnected = False
+
+        async def receive_body():
+            message = await receive()
+            if message['type'] == 'http.disconnect' or not message.get('more_body', False):
+                body_received.set()
+            return message
+
+        async def send_response(message):
+            nonlocal response_sent
+            if message['type'] == 'http.response.body' and not message.get('more_body', False):
+                response_sent = True
+            await send(message)
+
+        request_task = asyncio.ensure_future(self.app(scope, receive_body, send_response))
+
+        async def watch_disconnect():
+            nonlocal disconnected
+            await body_received.wait()
+            # После тела запроса сервер присылает только http.disconnect
+            message = await receive()
+            if message['type'] == 'http.disconnect' and not response_sent:
+                disconnected = True
+                request_task.cancel()
+
+        watcher = asyncio.ensure_future(watch_disconnect())
+        try:
+            await request_task
+        except asyncio.CancelledError:
+            if not disconnected:
+                request_task.cancel()
+                raise
+            logger.info(f"Клиент отключился, обработка {scope['method']} {scope['path']} отменена")
+        finally:
+            watcher.cancel()
@@ -0,0 +1,116 @@
+import asyncio
+import concurrent.futures
+import logging
+import threading
+import time
+from animals.services.dogs import Dogs
+
+logger = logging.getLogger(__name__)
+
+
+class BreedIndex:
+    """
+    Индекс пород собак в памяти.
+    Строится один раз из каталога dog.ceo и позволяет искать породы
+    по префиксу и подстроке без обращения к API.
+    Индекс строится одним запросом, даже если его одновременно ждут несколько
+    запросов из разных event loop. После неудачи каталог не запрашивается RETRY_AFTER секунд.
+    """
+    RETRY_AFTER = 30
+    _instance = None
+    _building = None  # concurrent.futures.Future построения, которое уже идет
+    _retry_at = 0.0  # time.monotonic(), раньше которого после неудачи не повторяем
+    _lock = threading.Lock()
+
+    def __init__(self, catalogue: dict):
+        # Породы храним отсортированными, чтобы выдача была стабильной
+        self.sub_breeds = {
+            breed.lower(): sorted(sub.lower() for sub in subs)
+            for breed, subs in catalogue.items()
+        }
+        self.breeds = sorted(self.sub_breeds)
+
+    def __contains__(self, breed: str) -> bool:
+        return breed in self.sub_breeds
+
+    def __len__(self) -> int:
+        return len(self.breeds)
+
+    def sub_breed_count(self, breed: str) -> int:
+        """Количество подпород у породы (0, если породы нет в индексе)"""
+        return len(self.sub_breeds.get(breed, []))
+
+    def search(self, query: str, limit: int = 20) -> list:
+        """
+        Ищет породы по запросу.
+        Args:
+            query (str): строка поиска
+            limit (int): максимальное количество результатов
+        Returns:
+            list: список словарей breed / sub_breeds / sub_breeds_count,
+            сначала совпадения по префиксу, затем по подстроке
+        """
+        query = query.strip().lower()
+        if not query:
+            matches = self.breeds
+        else:
+            prefix = [b for b in self.breeds if b.startswith(query)]
+            substring = [b for b in self.breeds if query in b and not b.startswith(query)]
+            matches = prefix + substring
+
+        return [
+            {
+                'breed': breed,
+                'sub_breeds': self.sub_breeds[breed],
+                'sub_breeds_count': self.sub_breed_count(breed),
+            }
+            for breed in matches[:limit]
+        ]
+
+    @classmethod
+    async def get(cls):
+        """
+        Возвращает индекс пород, при первом вызове строит его из каталога dog.ceo.
+        Returns:
+            BreedIndex или None, если каталог получить не удалось
+        """
+        with cls._lock:
+            if cls._instance is not None or time.monotonic() < cls._retry_at:
+                return cls._instance
+            building = cls._building
+            if building is None:
+                building = cls._building = concurrent.futures.Future()
+                owner = True
+            else:
+                owner = False
+
+        if not owner:
+            # shield: отмена одного ожидающего запроса не отменяет построение для остальных
+            return await asyncio.shield(asyncio.wrap_future(building))
+
+        index = None
+        failed = False
+        try:
+            catalogue = await Dogs.get_breeds_catalogue()
+            if catalogue:
+                index = cls(catalogue)
+                logger.info(f"Индекс пород построен: {len(index)} пород")
+            else:
+                failed = True
+                logger.error(f"Не удалось построить индекс пород, повтор через {cls.RETRY_AFTER} с")
+        finally:
+            with cls._lock:
+                cls._building = None
+                cls._instance = index
+                if failed:
+                    # При отмене запроса задержку не ставим: каталог мог быть доступен
+                    cls._retry_at = time.monotonic() + cls.RETRY_AFTER
+            building.set_result(index)
+        return index
+
+    @classmethod
+    def reset(cls):
+        """Сбрасывает построенный индекс и задержку после неудачи"""
+        with cls._lock:
+            cls._instance = None
+            cls._retry_at = 0.0
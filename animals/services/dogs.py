@@ -11,35 +11,61 @@ def add_all_sub_breed(func):
     Декоратор для функции get_dog.
     После получения основной породы автоматически получает подпороды
     и добавляет их в словарь с изображениями.
+    Подпороды запрашиваются в одной TaskGroup: при истечении deadline
+    или отмене запроса незавершенные задачи отменяются, а уже полученные
+    картинки сохраняются. Не полученные подпороды перечисляются в 'failed_sub_breeds'.
+    Список подпород берется из sub_breeds (индекс пород), а если он не передан -
+    запрашивается у API.
     """
     @wraps(func)
-    async def wrapper(breed: str, session: aiohttp.ClientSession):
-        result = await func(breed, session)
+    async def wrapper(breed: str, session: aiohttp.ClientSession, deadline: float | None = None,
+                      sub_breeds: list | None = None):
+        result = await func(breed, session, deadline)
         if result is None:
             return None
+
+        main_data = result[breed]
+        main_data['failed_sub_breeds'] = []
+        main_data['partial'] = False
+        if sub_breeds is None:
+            try:
+                async with asyncio.timeout_at(deadline):
+                    async with session.get(f'{Dogs.base_url}/breed/{breed}/list', timeout=timeout) as response:
+                        response.raise_for_status()
+                        data = await response.json()
+                        sub_breeds = data.get('message', [])
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.error(f"Ошибка при получении подпород {breed}: {e}")
+                main_data['partial'] = True
+                return result
+
+        if not sub_breeds:
+            return result
+
+        main_data['sub_breeds'] = {}
+        tasks = {}
         try:
-            async with session.get(f'{Dogs.base_url}/breed/{breed}/list', timeout=timeout) as response:
-                response.raise_for_status()
-                data = await response.json()
-                sub_breeds = data.get('message', [])
-
-            if sub_breeds:
-                result[breed]['sub_breeds'] = {}
-                # Создаем список корутин для подпород
-                coroutines = [Dogs._get_image(f"{breed}/{sub}", session) for sub in sub_breeds]
-                sub_images = await asyncio.gather(*coroutines)
-                for sub, img in zip(sub_breeds, sub_images):
-                    if img:
-                        result[breed]['sub_breeds'][sub] = {
-                            'filename': f'{breed}_{sub}',
-                            'size_bytes': len(img),
-                            'image': img
-                        }
-                        logger.info(f"Картинка подпороды {breed}_{sub} получена")
-                    else:
-                        logger.warning(f"Не удалось получить картинку подпороды {breed}_{sub}")
-        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
-            logger.error(f"Ошибка при получении подпород {breed}: {e}")
+            async with asyncio.timeout_at(deadline):
+                async with asyncio.TaskGroup() as tg:
+                    for sub in sub_breeds:
+                        tasks[sub] = tg.create_task(Dogs._get_prefetched_image(f"{breed}/{sub}", session))
+        except asyncio.TimeoutError:
+            logger.warning(f"Истек бюджет времени на подпороды {breed}, незавершенные запросы отменены")
+
+        for sub, task in tasks.items():
+            img = task.result() if task.done() and not task.cancelled() else None
+            if img:
+                main_data['sub_breeds'][sub] = {
+                    'filename': f'{breed}_{sub}',
+                    'size_bytes': len(img),
+                    'image': img
+                }
+                logger.info(f"Картинка подпороды {breed}_{sub} получена")
+            else:
+                main_data['failed_sub_breeds'].append(sub)
+                logger.warning(f"Не удалось получить картинку подпороды {breed}_{sub}")
+
+        main_data['partial'] = bool(main_data['failed_sub_breeds'])
         return result
     return wrapper
 
@@ -49,6 +75,8 @@ class Dogs:
     Класс для работы с изображениями собак через API dog.ceo
     """
     base_url = 'https://dog.ceo/api'
+    # Фоновая предзагрузка картинок (DogPrefetcher), подключается при ANIMALS_DOG_PREFETCH['ENABLED']
+    prefetcher = None
 
     @staticmethod
     async def _get_image(breed: str, session: aiohttp.ClientSession):
@@ -78,17 +106,39 @@ class Dogs:
             return None
 
 
+    @staticmethod
+    async def _get_prefetched_image(breed: str, session: aiohttp.ClientSession):
+        """
+        Берет картинку из буфера предзагрузки, а если он пуст - запрашивает у API.
+        Args:
+            breed (str): название породы или подпороды
+        Returns:
+            bytes или None: байты изображения или None при ошибке
+        """
+        if Dogs.prefetcher is not None:
+            image = await Dogs.prefetcher.take(breed)
+            if image is not None:
+                return image
+        return await Dogs._get_image(breed, session)
+
     @staticmethod
     @add_all_sub_breed
-    async def get_dog(breed: str, session: aiohttp.ClientSession):
+    async def get_dog(breed: str, session: aiohttp.ClientSession, deadline: float | None = None):
         """
         Получает изображение для основной породы
         Args:
             breed (str): название породы
+            deadline (float | None): момент времени loop.time(), после которого запросы отменяются
+            sub_breeds (list | None): подпороды из индекса пород, None - запросить у API
         Returns:
             dict или None: словарь с информацией о породе
         """
-        image = await Dogs._get_image(breed, session)
+        try:
+            async with asyncio.timeout_at(deadline):
+                image = await Dogs._get_prefetched_image(breed, session)
+        except asyncio.TimeoutError:
+            logger.error(f"Истек бюджет времени на получение основной породы: {breed}")
+            image = None
         if not image:
             logger.error(f"Не удалось получить изображение для основной породы: {breed}")
             return None
@@ -103,17 +153,18 @@ class Dogs:
         }
 
     @staticmethod
-    async def get_all_breeds():
+    async def get_breeds_catalogue():
         """
-        Получает список всех пород собак.
+        Получает каталог пород собак вместе с подпородами.
+        Returns:
+            dict или None: словарь {порода: [подпороды]}
         """
         try:
             async with aiohttp.ClientSession() as session:
                 async with session.get(f"{Dogs.base_url}/breeds/list/all", timeout=timeout) as response:
                     response.raise_for_status()
                     data = await response.json()
-                    breeds_dict = data.get("message", {})
-                    return list(breeds_dict.keys())
+                    return data.get("message", {})
 
         except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             logger.error(f"Ошибка при получении списка пород: {e}")
@@ -0,0 +1,167 @@
+import asyncio
+import io
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # без Pillow только определяем формат, перекодирование недоступно
+    Image = ImageOps = None
+
+logger = logging.getLogger(__name__)
+
+# Расширения файлов для поддерживаемых форматов
+EXTENSIONS = {
+    'JPEG': 'jpg',
+    'PNG': 'png',
+    'GIF': 'gif',
+    'WEBP': 'webp',
+}
+
+_executor = None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    """
+    Общий пул процессов для перекодирования картинок.
+    Процессы запускаются через forkserver: fork из процесса с потоками
+    (сервер, предзагрузка, async_to_sync) может унаследовать захваченные блокировки
+    """
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(mp_context=multiprocessing.get_context('forkserver'))
+    return _executor
+
+
+def detect_format(data: bytes) -> str | None:
+    """
+    Определяет настоящий формат картинки по сигнатуре файла.
+    Returns:
+        str или None: 'JPEG', 'PNG', 'GIF', 'WEBP' или None, если формат неизвестен
+    """
+    if data.startswith(b'\xff\xd8\xff'):
+        return 'JPEG'
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'PNG'
+    if data.startswith((b'GIF87a', b'GIF89a')):
+        return 'GIF'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'WEBP'
+    return None
+
+
+def _recompress(data: bytes, quality: int, max_size: int | None, to_webp: bool) -> tuple[bytes, str]:
+    """
+    Перекодирует картинку. Выполняется в отдельном процессе.
+    Анимированные картинки возвращаются без изменений: при перекодировании остался бы один кадр.
+    Returns:
+        tuple: (байты картинки, формат)
+    """
+    with Image.open(io.BytesIO(data)) as img:
+        if getattr(img, 'is_animated', False):
+            return data, img.format
+        # Ориентация из EXIF: при перекодировании EXIF не сохраняется, и картинка оказалась бы повернута
+        img = ImageOps.exif_transpose(img)
+        if max_size:
+            img.thumbnail((max_size, max_size))
+
+        fmt = 'WEBP' if to_webp else 'JPEG'
+        if fmt == 'JPEG' and img.mode not in ('RGB', 'L'):
+            # В JPEG нет прозрачности: накладываем картинку на белый фон, а не на черный
+            img = img.convert('RGBA')
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            background.paste(img, mask=img.getchannel('A'))
+            img = background
+
+        buffer = io.BytesIO()
+        img.save(buffer, format=fmt, quality=quality, optimize=True)
+        return buffer.getvalue(), fmt
+
+
+class ImageProcessor:
+    """
+    Обработка картинок перед загрузкой на Яндекс Диск:
+    определяет настоящий формат и перекодирует картинку с заданным качеством и размером.
+    Перекодирование выполняется в пуле процессов и не блокирует event loop.
+    """
+    def __init__(self, quality: int = 85, max_size: int | None = None, to_webp: bool = False):
+        self.quality = quality
+        self.max_size = max_size
+        self.to_webp = to_webp
+
+    async def process(self, image_data: dict) -> dict:
+        """
+        Обрабатывает одну картинку.
+        Args:
+            image_data (dict): словарь с ключами filename / size_bytes / image
+        Returns:
+            dict: тот же словарь с обновленными image и size_bytes, а также
+            original_size_bytes и extension
+        """
+        original = image_data['image']
+        fmt = detect_format(original)
+        result = {
+            **image_data,
+            'original_size_bytes': len(original),
+            'extension': EXTENSIONS.get(fmt, 'jpg'),
+        }
+
+        # GIF и неизвестные форматы не перекодируем, анимированные WebP пропускает _recompress
+        if Image is None or fmt in (None, 'GIF'):
+            return result
+
+        loop = asyncio.get_running_loop()
+        try:
+            image, new_fmt = await loop.run_in_executor(
+                _get_executor(), _recompress, original, self.quality, self.max_size, self.to_webp
+            )
+        except Exception as e:
+            logger.error(f"Ошибка при обработке картинки {image_data['filename']}: {e}")
+            return result
+
+        # Перекодированная картинка не меньше исходной - оставляем исходную
+        if len(image) >= len(original):
+            return result
+
+        logger.info(f"Картинка {image_data['filename']} сжата: {len(original)} -> {len(image)} байт")
+        result.update({
+            'image': image,
+            'size_bytes': len(image),
+            'extension': EXTENSIONS[new_fmt],
+        })
+        return result
+
+    async def process_all(self, image_data: dict, deadline: float | None = None) -> dict:
+        """
+        Обрабатывает данные в формате upload_data:
+        одну картинку (cataas.com) или словарь пород с подпородами (dog.ceo).
+        Если обработка не уложилась в deadline (момент времени loop.time()),
+        возвращает исходные данные без изменений.
+        """
+        try:
+            async with asyncio.timeout_at(deadline):
+                return await self._process_all(image_data)
+        except asyncio.TimeoutError:
+            logger.warning("Истек бюджет времени на обработку картинок, загружаются исходные")
+            return image_data
+
+    async def _process_all(self, image_data: dict) -> dict:
+        if 'image' in image_data:
+            return await self.process(image_data)
+
+        result = {}
+        async with asyncio.TaskGroup() as tg:
+            tasks = {}
+            for breed, breed_data in image_data.items():
+                tasks[breed] = tg.create_task(self.process(breed_data))
+                for sub, sub_data in breed_data.get('sub_breeds', {}).items():
+                    tasks[(breed, sub)] = tg.create_task(self.process(sub_data))
+
+        for breed, breed_data in image_data.items():
+            result[breed] = tasks[breed].result()
+            if 'sub_breeds' in breed_data:
+                result[breed]['sub_breeds'] = {
+                    sub: tasks[(breed, sub)].result() for sub in breed_data['sub_breeds']
+                }
+        return result
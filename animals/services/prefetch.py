@@ -0,0 +1,272 @@
+import asyncio
+import aiohttp
+import logging
+import os
+import shutil
+import threading
+import uuid
+from collections import defaultdict, deque
+from pathlib import Path
+from animals.services.breed_index import BreedIndex
+from animals.services.dogs import Dogs
+
+logger = logging.getLogger(__name__)
+
+
+class DogPrefetcher(threading.Thread):
+    """
+    Фоновая предзагрузка случайных картинок собак.
+    Для каждой популярной породы и ее подпород держит небольшой буфер готовых картинок
+    и пополняет его в отдельном потоке со своим event loop через Dogs._get_image.
+    Буферы ограничены по количеству картинок на породу и по общему объему.
+    Если задан directory, картинки хранятся на диске в подпапке процесса (по PID), иначе в памяти.
+    Каждый процесс сервера держит свои буферы, поэтому max_bytes - ограничение на один процесс.
+    Место под картинку резервируется до загрузки по среднему размеру картинки,
+    а породы, которые не удается получить, запрашиваются с экспоненциальной задержкой.
+    """
+    MAX_BACKOFF = 300
+    def __init__(self, breeds: list, buffer_size: int = 3, max_bytes: int = 50 * 1024 * 1024,
+                 directory: str | None = None, refill_interval: float = 1.0, concurrency: int = 4):
+        super().__init__(daemon=True, name='dog-prefetcher')
+        self.breeds = breeds
+        self.buffer_size = buffer_size
+        self.max_bytes = max_bytes
+        # У каждого процесса своя подпапка: процессы не удаляют и не забирают чужие картинки
+        self.directory = Path(directory) / str(os.getpid()) if directory else None
+        self.refill_interval = refill_interval
+        self.concurrency = concurrency
+
+        self._buffers = defaultdict(deque)  # порода -> deque[(размер, bytes или Path)]
+        self._bytes = 0
+        self._reserved = 0  # место, зарезервированное под картинки, которые еще скачиваются
+        self._estimate = 0  # средний размер картинки, по нему резервируется место
+        self._failures = defaultdict(int)  # порода -> неудачных попыток подряд
+        self._next_attempt = {}  # порода -> loop.time(), раньше которого не запрашиваем
+        self._lock = threading.Lock()
+        self._loop = None
+        self._wakeup = None
+        self._task = None
+        self._stopped = False
+
+        if self.directory:
+            # Файлы прошлого процесса с тем же PID в буфер не попадут, удаляем их
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    def run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        with self._lock:
+            # stop() мог быть вызван до запуска задачи
+            if not self._stopped:
+                self._task = self._loop.create_task(self._refill_forever())
+        try:
+            if self._task is not None:
+                self._loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            logger.info("Предзагрузка картинок остановлена")
+        except Exception as e:
+            logger.exception(f"Предзагрузка картинок остановлена из-за ошибки: {e}")
+        finally:
+            self._loop.close()
+
+    def stop(self):
+        """Останавливает пополнение буферов, отменяет незавершенные запросы и удаляет файлы буфера"""
+        with self._lock:
+            self._stopped = True
+            task = self._task
+        if task is not None:
+            try:
+                self._loop.call_soon_threadsafe(task.cancel)
+            except RuntimeError:
+                pass  # event loop уже закрыт: поток завершился сам
+        if self.ident is not None:
+            self.join()
+        if self.directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    async def take(self, breed: str) -> bytes | None:
+        """
+        Забирает готовую картинку из буфера.
+        Вызывается из event loop запроса: файл буфера читается в отдельном потоке.
+        Args:
+            breed (str): порода или подпорода в формате 'breed/sub'
+        Returns:
+            bytes или None, если буфер пуст
+        """
+        with self._lock:
+            buffer = self._buffers.get(breed)
+            if not buffer:
+                return None
+            size, item = buffer.popleft()
+            self._bytes -= size
+
+        if self._loop is not None and self._wakeup is not None and not self._loop.is_closed():
+            try:
+                self._loop.call_soon_threadsafe(self._wakeup.set)
+            except RuntimeError:
+                pass  # поток предзагрузки уже остановлен, оставшиеся картинки еще можно забрать
+
+        if isinstance(item, bytes):
+            return item
+        try:
+            return await asyncio.to_thread(self._read_and_remove, item)
+        except OSError as e:
+            logger.error(f"Ошибка при чтении предзагруженной картинки {item}: {e}")
+            return None
+
+    @staticmethod
+    def _read_and_remove(path: Path) -> bytes:
+        image = path.read_bytes()
+        path.unlink(missing_ok=True)
+        return image
+
+    def _reserve(self) -> int | None:
+        """
+        Резервирует место под одну картинку по среднему размеру.
+        Returns:
+            int или None: зарезервированный объем или None, если места не хватает
+        """
+        with self._lock:
+            if self._bytes + self._reserved + self._estimate > self.max_bytes:
+                return None
+            self._reserved += self._estimate
+            return self._estimate
+
+    def _store(self, breed: str, image: bytes, reserved: int) -> bool:
+        """Кладет картинку в буфер вместо зарезервированного места, если хватает места"""
+        with self._lock:
+            self._reserved -= reserved
+            # Средний размер картинки для резервирования следующих загрузок
+            self._estimate = len(image) if not self._estimate else (self._estimate * 3 + len(image)) // 4
+            if self._bytes + len(image) > self.max_bytes or len(self._buffers[breed]) >= self.buffer_size:
+                return False
+            self._bytes += len(image)
+
+        item = image
+        if self.directory:
+            item = self.directory / f"{breed.replace('/', '_')}-{uuid.uuid4().hex}.img"
+            try:
+                item.write_bytes(image)
+            except OSError as e:
+                logger.error(f"Ошибка при сохранении предзагруженной картинки {item}: {e}")
+                with self._lock:
+                    self._bytes -= len(image)
+                return False
+
+        with self._lock:
+            self._buffers[breed].append((len(image), item))
+        return True
+
+    async def _refill(self, breed: str, session: aiohttp.ClientSession,
+                      semaphore: asyncio.Semaphore, reserved: int):
+        try:
+            async with semaphore:
+                image = await Dogs._get_image(breed, session)
+        except Exception as e:
+            # Непредвиденная ошибка не должна остановить предзагрузку остальных пород
+            logger.exception(f"Ошибка при предзагрузке {breed}: {e}")
+            image = None
+        except BaseException:
+            with self._lock:
+                self._reserved -= reserved
+            raise
+
+        if image is None:
+            with self._lock:
+                self._reserved -= reserved
+            # Экспоненциальная задержка для пород, которые не удается получить
+            self._failures[breed] += 1
+            delay = min(self.refill_interval * 2 ** self._failures[breed], self.MAX_BACKOFF)
+            self._next_attempt[breed] = asyncio.get_running_loop().time() + delay
+            logger.warning(f"Предзагрузка {breed} не удалась, следующая попытка через {delay:.1f} с")
+            return
+
+        self._failures.pop(breed, None)
+        self._next_attempt.pop(breed, None)
+        try:
+            if self._store(breed, image, reserved):
+                logger.info(f"Предзагружена картинка {breed}")
+        except Exception as e:
+            logger.exception(f"Ошибка при сохранении предзагруженной картинки {breed}: {e}")
+
+    async def _refill_forever(self):
+        """Пополняет буферы: сразу после take() или раз в refill_interval секунд"""
+        self._wakeup = asyncio.Event()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        keys = []
+        while not keys:
+            index = await BreedIndex.get()
+            if index is None:
+                await asyncio.sleep(self.refill_interval)
+                continue
+            for breed in self.breeds:
+                if breed not in index:
+                    logger.warning(f"Порода {breed} не найдена, предзагрузка пропущена")
+                    continue
+                keys.append(breed)
+                keys.extend(f'{breed}/{sub}' for sub in index.sub_breeds[breed])
+            if not keys:
+                logger.error("Нет пород для предзагрузки")
+                return
+
+        async with aiohttp.ClientSession() as session:
+            while True:
+                self._wakeup.clear()
+                now = asyncio.get_running_loop().time()
+                with self._lock:
+                    missing = [
+                        key for key in keys
+                        if len(self._buffers[key]) < self.buffer_size and self._next_attempt.get(key, 0) <= now
+                    ]
+                    probe = not self._estimate
+                    if probe:
+                        # Размер картинок еще неизвестен: сначала скачиваем одну
+                        missing = missing[:1]
+                async with asyncio.TaskGroup() as tg:
+                    for key in missing:
+                        # Не скачиваем картинки, под которые не хватит места
+                        reserved = self._reserve()
+                        if reserved is None:
+                            break
+                        tg.create_task(self._refill(key, session, semaphore, reserved))
+                if probe and self._estimate:
+                    # Размер картинок стал известен - пополняем остальные буферы сразу
+                    continue
+
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.refill_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+
+_start_lock = threading.Lock()
+
+
+def start_dog_prefetcher(options: dict):
+    """
+    Запускает фоновую предзагрузку картинок собак по настройкам ANIMALS_DOG_PREFETCH
+    и подключает ее к Dogs. Повторный вызов ничего не делает
+    """
+    with _start_lock:
+        if Dogs.prefetcher is not None:
+            return
+        prefetcher = DogPrefetcher(
+            breeds=options.get('BREEDS', []),
+            buffer_size=options.get('BUFFER_SIZE', 3),
+            max_bytes=options.get('MAX_BYTES', 50 * 1024 * 1024),
+            directory=options.get('DIR'),
+            refill_interval=options.get('REFILL_INTERVAL', 1.0),
+            concurrency=options.get('CONCURRENCY', 4),
+        )
+        prefetcher.start()
+        Dogs.prefetcher = prefetcher
+
+
+def stop_dog_prefetcher():
+    """Останавливает фоновую предзагрузку и отключает ее от Dogs"""
+    with _start_lock:
+        prefetcher, Dogs.prefetcher = Dogs.prefetcher, None
+    if prefetcher is not None:
+        prefetcher.stop()
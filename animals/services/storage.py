@@ -0,0 +1,297 @@
+import abc
+import asyncio
+import aiohttp
+import hashlib
+import hmac
+import json
+import logging
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import quote
+from yarl import URL
+from animals.services.images import EXTENSIONS, detect_format
+
+logger = logging.getLogger(__name__)
+
+
+class StorageBackend(abc.ABC):
+    """
+    Базовый класс для мест хранения резервных копий.
+    Наследники реализуют _upload_bytes и, при необходимости, create_folder,
+    а общий upload_data раскладывает картинки и метаданные по файлам.
+    """
+    name = 'storage'
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def _ensure_session(self):
+        pass
+
+    async def create_folder(self, folder_path: str, deadline: float | None = None) -> bool:
+        """Создает папку. По умолчанию папки создавать не нужно"""
+        return True
+
+    @abc.abstractmethod
+    async def _upload_bytes(self, folder_path: str, filename: str, data: bytes) -> bool:
+        """Сохраняет один файл, возвращает True при успехе"""
+
+    async def upload_data(self, folder_path: str, image_data: dict, deadline: float | None = None) -> dict:
+        """
+        Универсальная загрузка данных:
+        - Если передан один файл (api cataas.com), загружает 1 картинку и 1 .json
+        - Если передан словарь с подпородами (api dog.ceo) загружает все картинки и общий .json
+        Расширение файла берется из 'extension' или определяется по содержимому картинки.
+        Картинки загружаются в одной TaskGroup. При истечении deadline
+        (момент времени loop.time()) незавершенные загрузки отменяются.
+        Returns:
+            dict: отчет о загрузке:
+                - uploaded: имена загруженных файлов
+                - failed: имена файлов, которые загрузить не удалось
+                - json_uploaded: загружен ли файл с метаданными
+                - bytes: сколько байт загружено
+                - seconds: длительность загрузки
+                - bytes_per_second: пропускная способность
+        """
+        await self._ensure_session()
+
+        result = []
+        report = {'uploaded': [], 'failed': [], 'json_uploaded': False, 'bytes': 0}
+
+        async def _upload_single_image(image_data: dict):
+            """
+            Вспомогательная функция для загрузки одного изображения и возврата json
+            """
+            filename = image_data.get('filename')
+            try:
+                size_bytes = image_data['size_bytes']
+                image = image_data['image']
+                extension = image_data.get('extension') or EXTENSIONS.get(detect_format(image), 'jpg')
+                if not await self._upload_bytes(folder_path, f'{filename}.{extension}', image):
+                    report['failed'].append(filename)
+                    return
+                result.append({
+                    'filename': filename,
+                    'extension': extension,
+                    'original_size_bytes': image_data.get('original_size_bytes', size_bytes),
+                    'size_bytes': size_bytes
+                })
+                report['uploaded'].append(filename)
+                report['bytes'] += len(image)
+            except Exception as e:
+                logger.error(f"Ошибка при загрузке файла {filename}: {e}")
+                report['failed'].append(filename)
+
+        async def _upload_json(filename: str):
+            try:
+                json_bytes = json.dumps(result, indent=4, ensure_ascii=False).encode('utf-8')
+                report['json_uploaded'] = await self._upload_bytes(folder_path, f"{filename}.json", json_bytes)
+                if report['json_uploaded']:
+                    report['bytes'] += len(json_bytes)
+                    logger.info(f"Файл {filename}.json успешно загружен!")
+            except Exception as e:
+                logger.error(f"Ошибка при загрузке JSON: {e}")
+
+        images = _images(image_data)
+        # С одной картинкой (cataas.com) метаданные называются по картинке, с несколькими (dog.ceo) - result
+        json_name = image_data['filename'] if 'image' in image_data else 'result'
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        try:
+            async with asyncio.timeout_at(deadline):
+                async with asyncio.TaskGroup() as tg:
+                    for data in images:
+                        tg.create_task(_upload_single_image(data))
+                await _upload_json(json_name)
+        except asyncio.TimeoutError:
+            logger.warning(f"Истек бюджет времени на загрузку в {folder_path}, незавершенные загрузки отменены")
+
+        done = set(report['uploaded']) | set(report['failed'])
+        report['failed'].extend(data['filename'] for data in images if data['filename'] not in done)
+
+        report['seconds'] = round(loop.time() - start, 3)
+        report['bytes_per_second'] = round(report['bytes'] / report['seconds']) if report['seconds'] else 0
+        logger.info(
+            f"Загрузка в {self.name}: {report['bytes']} байт за {report['seconds']} с "
+            f"({report['bytes_per_second']} байт/с)"
+        )
+        return report
+
+
+class LocalStorage(StorageBackend):
+    """Сохранение резервных копий в папку на локальном диске"""
+    name = 'local'
+
+    def __init__(self, root: str):
+        self.root = Path(root).resolve()
+
+    def _resolve(self, folder_path: str) -> Path | None:
+        """Путь внутри root или None, если folder_path выходит за его пределы"""
+        path = (self.root / folder_path).resolve()
+        if path != self.root and self.root not in path.parents:
+            logger.error(f"Путь {folder_path} выходит за пределы {self.root}")
+            return None
+        return path
+
+    async def create_folder(self, folder_path: str, deadline: float | None = None) -> bool:
+        path = self._resolve(folder_path)
+        if path is None:
+            return False
+        try:
+            await asyncio.to_thread(path.mkdir, parents=True, exist_ok=True)
+        except OSError as e:
+            logger.error(f"Ошибка при создании папки {path}: {e}")
+            return False
+        return True
+
+    async def _upload_bytes(self, folder_path: str, filename: str, data: bytes) -> bool:
+        path = self._resolve(f'{folder_path}/{filename}')
+        if path is None:
+            return False
+        try:
+            await asyncio.to_thread(path.write_bytes, data)
+            logger.info(f"Файл {filename} сохранен в {path.parent}")
+            return True
+        except OSError as e:
+            logger.error(f"Ошибка при сохранении {filename}: {e}")
+            return False
+
+
+class S3Storage(StorageBackend):
+    """
+    Загрузка резервных копий в S3-совместимое хранилище (AWS S3, MinIO, Yandex Object Storage).
+    Запросы подписываются AWS Signature V4, адресация бакета - path-style.
+    Папок в S3 нет, поэтому folder_path становится префиксом ключа.
+    """
+    name = 's3'
+
+    def __init__(self, endpoint_url: str, bucket: str, access_key: str, secret_key: str,
+                 region: str = 'us-east-1'):
+        self.endpoint_url = endpoint_url.rstrip('/')
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.session = None
+
+        # Заголовок Host в том виде, в котором его отправит aiohttp: без порта по умолчанию
+        url = URL(self.endpoint_url)
+        self.host = f'[{url.raw_host}]' if ':' in url.raw_host else url.raw_host
+        if not url.is_default_port():
+            self.host = f'{self.host}:{url.port}'
+
+    async def __aenter__(self):
+        self.session = aiohttp.ClientSession()
+        return self
+
+    async def __aexit__(self, *args):
+        if self.session:
+            await self.session.close()
+
+    async def _ensure_session(self):
+        if self.session is None:
+            self.session = aiohttp.ClientSession()
+
+    def _sign(self, method: str, path: str, payload_hash: str) -> dict:
+        """Заголовки запроса с подписью AWS Signature V4"""
+        now = datetime.now(timezone.utc)
+        amz_date = now.strftime('%Y%m%dT%H%M%SZ')
+        datestamp = now.strftime('%Y%m%d')
+
+        signed_headers = 'host;x-amz-content-sha256;x-amz-date'
+        canonical_headers = f'host:{self.host}\nx-amz-content-sha256:{payload_hash}\nx-amz-date:{amz_date}\n'
+        canonical_request = '\n'.join([method, path, '', canonical_headers, signed_headers, payload_hash])
+
+        scope = f'{datestamp}/{self.region}/s3/aws4_request'
+        string_to_sign = '\n'.join([
+            'AWS4-HMAC-SHA256', amz_date, scope, hashlib.sha256(canonical_request.encode()).hexdigest()
+        ])
+
+        key = f'AWS4{self.secret_key}'.encode()
+        for part in (datestamp, self.region, 's3', 'aws4_request'):
+            key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+        signature = hmac.new(key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+
+        return {
+            'x-amz-date': amz_date,
+            'x-amz-content-sha256': payload_hash,
+            'Authorization': (
+                f'AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, '
+                f'SignedHeaders={signed_headers}, Signature={signature}'
+            ),
+        }
+
+    async def _upload_bytes(self, folder_path: str, filename: str, data: bytes) -> bool:
+        key = '/'.join(part for part in (folder_path.strip('/'), filename) if part)
+        path = quote(f'/{self.bucket}/{key}', safe='/-_.~')
+        headers = self._sign('PUT', path, hashlib.sha256(data).hexdigest())
+        try:
+            url = URL(f'{self.endpoint_url}{path}', encoded=True)
+            async with self.session.put(url, data=data, headers=headers) as response:
+                response.raise_for_status()
+                logger.info(f"Файл {filename} успешно загружен в s3://{self.bucket}/{folder_path}")
+                return True
+        except aiohttp.ClientError as e:
+            logger.error(f"Ошибка при загрузке {filename} в S3: {e}")
+            return False
+
+
+def _images(image_data: dict) -> list:
+    """
+    Список картинок для загрузки:
+    - одна картинка (api cataas.com)
+    - породы и их подпороды (api dog.ceo)
+    """
+    if 'image' in image_data:
+        return [image_data]
+
+    images = []
+    for breed_data in image_data.values():
+        images.append(breed_data)
+        # если есть подпороды
+        if 'sub_breeds' in breed_data:
+            images.extend(breed_data['sub_breeds'].values())
+    return images
+
+
+def _failed_report(image_data: dict) -> dict:
+    """Отчет для места хранения, в которое ничего не загружено"""
+    return {
+        'uploaded': [], 'failed': [data['filename'] for data in _images(image_data)], 'json_uploaded': False,
+        'bytes': 0, 'seconds': 0, 'bytes_per_second': 0,
+    }
+
+
+async def upload_to_all(targets: list, folder_path: str, image_data: dict, deadline: float | None = None) -> dict:
+    """
+    Загружает одни и те же данные сразу во все места хранения.
+    Картинки не запрашиваются и не перекодируются повторно, цели работают параллельно.
+    Ошибка в одном месте хранения не прерывает загрузку в остальные.
+    Returns:
+        dict: {имя цели: отчет upload_data}
+    """
+    names = [target.name for target in targets]
+    if len(names) != len(set(names)):
+        raise ValueError(f"Имена мест хранения должны быть уникальными: {names}")
+
+    reports = {}
+
+    async def _upload(target: StorageBackend):
+        try:
+            async with target:
+                if not await target.create_folder(folder_path, deadline):
+                    reports[target.name] = _failed_report(image_data)
+                    return
+                reports[target.name] = await target.upload_data(folder_path, image_data, deadline)
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке в {target.name}: {e}")
+            reports[target.name] = _failed_report(image_data)
+
+    async with asyncio.TaskGroup() as tg:
+        for target in targets:
+            tg.create_task(_upload(target))
+    return reports
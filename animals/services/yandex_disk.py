@@ -1,7 +1,7 @@
 import asyncio
 import aiohttp
-import json
 import logging
+from animals.services.storage import StorageBackend
 
 logger = logging.getLogger(__name__)
 
@@ -10,9 +10,10 @@ class YandexDisk:
     """
     Базовый класс для работы с яндекс диском
     """
+    base_url = 'https://cloud-api.yandex.net/v1/disk'
+
     def __init__(self, token: str):
         self.token = token
-        self.base_url = 'https://cloud-api.yandex.net/v1/disk'
         self.headers = {
             'Authorization': f'OAuth {self.token}',
             'Content-Type': 'application/json'
@@ -56,19 +57,30 @@ class YandexDisk:
         await self._make_request('PUT', 'resources', params=params)
         logger.info(f"Создана папка: {folder_path}")
 
-    async def create_folder(self, folder_path: str):
-        """Создает папку или вложенную папку"""
+    async def create_folder(self, folder_path: str, deadline: float | None = None) -> bool:
+        """
+        Создает папку или вложенную папку.
+        Возвращает False, если до deadline (момент времени loop.time()) уложиться не удалось
+        """
         await self._ensure_session()
 
         parts = folder_path.split('/')
         path = ''
-        for part in parts:
-            path = f'{path}/{part}' if path else part
-            await self._create_folder(path)
+        try:
+            async with asyncio.timeout_at(deadline):
+                for part in parts:
+                    path = f'{path}/{part}' if path else part
+                    await self._create_folder(path)
+        except asyncio.TimeoutError:
+            logger.error(f"Истек бюджет времени на создание папки {folder_path}")
+            return False
+        return True
 
 
-class YandexDiskFileManager(YandexDisk):
+class YandexDiskFileManager(YandexDisk, StorageBackend):
     """Класс для загрузки файлов в яндекс диск"""
+    name = 'yandex'
+
     async def _upload_bytes(self, folder_path: str, filename: str, data: bytes) -> bool:
         """Загрузка файла на яндекс диск"""
         try:
@@ -92,58 +104,3 @@ class YandexDiskFileManager(YandexDisk):
         except aiohttp.ClientError as e:
             logger.error(f"Ошибка при загрузке {filename}: {e}")
             return False
-
-    async def upload_data(self, folder_path: str, image_data: dict):
-        """
-        Универсальная загрузка данных:
-        - Если передан один файл (api cataas.com), загружает 1 .jpg и 1 .json
-        - Если передан словарь с подпородами (api dog.ceo) загружает все .jpg и общий .json
-        """
-        await self._ensure_session()
-
-        result = []
-
-        async def _upload_single_image(image_data: dict):
-            """
-            Вспомогательная функция для загрузки одного изображения и возврата json
-            """
-            try:
-                filename = image_data['filename']
-                size_bytes = image_data['size_bytes']
-                image = image_data['image']
-                await self._upload_bytes(folder_path, f'{filename}.jpg', image)
-                result.append({
-                    'filename': filename,
-                    'size_bytes': size_bytes
-                })
-            except Exception as e:
-                logger.error(f"Ошибка при загрузке файла {filename}.jpg: {e}")
-
-        async def _upload_json(filename: str):
-            try:
-                json_bytes = json.dumps(result, indent=4, ensure_ascii=False).encode('utf-8')
-                await self._upload_bytes(folder_path, f"{filename}.json", json_bytes)
-                logger.info(f"Файл {filename}.json успешно загружен!")
-            except Exception as e:
-                logger.error(f"Ошибка при загрузке JSON: {e}")
-
-        tasks = []
-
-        # С одной картинкой (cataas.com)
-        if 'image' in image_data:
-            tasks.append(_upload_single_image(image_data))
-            await asyncio.gather(*tasks)
-            await _upload_json(image_data['filename'])
-            # С несколькими картинками (dog.ceo)
-        else:
-            for breed_data in image_data.values():
-                tasks.append(_upload_single_image(breed_data))
-                # если есть подпороды
-                if 'sub_breeds' in breed_data:
-                    for sub_data in breed_data['sub_breeds'].values():
-                        tasks.append(_upload_single_image(sub_data))
-            await asyncio.gather(*tasks)
-            await _upload_json('result')
-
-
-
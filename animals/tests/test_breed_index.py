@@ -0,0 +1,106 @@
+import asyncio
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+
+from animals.services.breed_index import BreedIndex
+from animals.services.dogs import Dogs
+
+CATALOGUE = {
+    'bulldog': ['french', 'boston', 'english'],
+    'bull': [],
+    'mastiff': ['bull'],
+    'pitbull': [],
+    'pug': [],
+}
+
+
+class BreedIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        self.index = BreedIndex(CATALOGUE)
+
+    def test_prefix_before_substring(self):
+        breeds = [item['breed'] for item in self.index.search('bull')]
+        self.assertEqual(breeds, ['bull', 'bulldog', 'pitbull'])
+
+    def test_limit(self):
+        self.assertEqual(len(self.index.search('', limit=2)), 2)
+        self.assertEqual([item['breed'] for item in self.index.search('bull', limit=1)], ['bull'])
+
+    def test_sub_breeds(self):
+        result = self.index.search('BullDog ')[0]
+        self.assertEqual(result['sub_breeds'], ['boston', 'english', 'french'])
+        self.assertEqual(result['sub_breeds_count'], 3)
+
+
+class BreedIndexGetTests(SimpleTestCase):
+    """Построение индекса: один запрос каталога и задержка после неудачи"""
+
+    def setUp(self):
+        BreedIndex.reset()
+        self.addCleanup(BreedIndex.reset)
+
+    async def test_concurrent_calls_build_once(self):
+        calls = 0
+
+        async def catalogue():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return CATALOGUE
+
+        with mock.patch.object(Dogs, 'get_breeds_catalogue', catalogue):
+            indexes = await asyncio.gather(*(BreedIndex.get() for _ in range(5)))
+            self.assertIs(await BreedIndex.get(), indexes[0])
+
+        self.assertEqual(calls, 1)
+        self.assertTrue(all(index is indexes[0] for index in indexes))
+        self.assertIn('bulldog', indexes[0])
+
+    async def test_failure_is_not_retried_immediately(self):
+        catalogue = mock.AsyncMock(return_value=None)
+        with mock.patch.object(Dogs, 'get_breeds_catalogue', catalogue):
+            self.assertIsNone(await BreedIndex.get())
+            self.assertIsNone(await BreedIndex.get())
+        self.assertEqual(catalogue.await_count, 1)
+
+        # По истечении задержки каталог запрашивается снова
+        catalogue = mock.AsyncMock(return_value=CATALOGUE)
+        with mock.patch.object(Dogs, 'get_breeds_catalogue', catalogue), \
+                mock.patch('animals.services.breed_index.time.monotonic', return_value=BreedIndex._retry_at):
+            self.assertIsNotNone(await BreedIndex.get())
+
+    async def test_cancelled_waiter_does_not_cancel_build(self):
+        async def catalogue():
+            await asyncio.sleep(0.05)
+            return CATALOGUE
+
+        with mock.patch.object(Dogs, 'get_breeds_catalogue', catalogue):
+            owner = asyncio.create_task(BreedIndex.get())
+            await asyncio.sleep(0)
+            waiter = asyncio.create_task(BreedIndex.get())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            self.assertIsNotNone(await owner)
+
+
+class UnknownBreedViewTests(TestCase):
+
+    def setUp(self):
+        BreedIndex._instance = BreedIndex(CATALOGUE)
+        self.addCleanup(BreedIndex.reset)
+
+    def test_unknown_breed_shows_error(self):
+        with mock.patch.object(Dogs, 'get_dog') as get_dog:
+            response = self.client.post('/dogs/get/', {'breed': 'Nosuchdog'}, follow=True)
+        get_dog.assert_not_called()
+        self.assertContains(response, 'Порода «nosuchdog» не найдена')
+        # Сообщение показывается один раз
+        self.assertNotContains(self.client.get('/dogs/'), 'не найдена')
+
+    def test_sub_breeds_are_taken_from_index(self):
+        data = {'bulldog': {'filename': 'bulldog', 'size_bytes': 4, 'image': b'\xff\xd8\xff\xe0'}}
+        with mock.patch.object(Dogs, 'get_dog', mock.AsyncMock(return_value=data)) as get_dog:
+            self.client.post('/dogs/get/', {'breed': 'bulldog'})
+        self.assertEqual(get_dog.await_args.args[3], ['boston', 'english', 'french'])
@@ -0,0 +1,58 @@
+import asyncio
+from unittest import mock
+
+import aiohttp
+from django.test import SimpleTestCase
+
+from animals.services.dogs import Dogs
+
+
+async def fake_get_image(breed, session):
+    """Картинки приходят сразу, а подпорода 'slow' - через секунду"""
+    if breed.endswith('/slow'):
+        await asyncio.sleep(1)
+    return f'image of {breed}'.encode()
+
+
+class GetDogTests(SimpleTestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(Dogs, '_get_image', fake_get_image)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_sub_breeds_from_index(self):
+        async with aiohttp.ClientSession() as session:
+            data = await Dogs.get_dog('hound', session, None, ['afghan', 'basset'])
+        main = data['hound']
+        self.assertEqual(main['image'], b'image of hound')
+        self.assertEqual(sorted(main['sub_breeds']), ['afghan', 'basset'])
+        self.assertEqual(main['sub_breeds']['afghan']['filename'], 'hound_afghan')
+        self.assertEqual(main['failed_sub_breeds'], [])
+        self.assertFalse(main['partial'])
+
+    async def test_deadline_keeps_received_sub_breeds(self):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        async with aiohttp.ClientSession() as session:
+            data = await Dogs.get_dog('hound', session, start + 0.2, ['afghan', 'slow'])
+        main = data['hound']
+        self.assertLess(loop.time() - start, 0.5)
+        self.assertEqual(list(main['sub_breeds']), ['afghan'])
+        self.assertEqual(main['failed_sub_breeds'], ['slow'])
+        self.assertTrue(main['partial'])
+
+    async def test_main_breed_deadline(self):
+        async with aiohttp.ClientSession() as session:
+            deadline = asyncio.get_running_loop().time() + 0.2
+            self.assertIsNone(await Dogs.get_dog('hound/slow', session, deadline, []))
+
+    async def test_sub_breed_list_unavailable_is_partial(self):
+        # Без списка из индекса подпороды запрашиваются у API, а оно недоступно
+        with mock.patch.object(Dogs, 'base_url', 'http://127.0.0.1:1/api'):
+            async with aiohttp.ClientSession() as session:
+                data = await Dogs.get_dog('hound', session)
+        main = data['hound']
+        self.assertNotIn('sub_breeds', main)
+        self.assertEqual(main['failed_sub_breeds'], [])
+        self.assertTrue(main['partial'])
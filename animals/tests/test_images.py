@@ -0,0 +1,122 @@
+import asyncio
+import io
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+
+from animals import views
+from animals.services import images
+from animals.services.images import ImageProcessor, _recompress, detect_format
+
+
+def make_image(fmt: str, size=(40, 20), mode='RGB', color=(200, 30, 30), **params) -> bytes:
+    buffer = io.BytesIO()
+    Image.new(mode, size, color).save(buffer, format=fmt, **params)
+    return buffer.getvalue()
+
+
+class DetectFormatTests(SimpleTestCase):
+
+    def test_formats(self):
+        self.assertEqual(detect_format(make_image('JPEG')), 'JPEG')
+        self.assertEqual(detect_format(make_image('PNG')), 'PNG')
+        self.assertEqual(detect_format(make_image('GIF')), 'GIF')
+        self.assertEqual(detect_format(make_image('WEBP')), 'WEBP')
+
+    def test_unknown(self):
+        self.assertIsNone(detect_format(b''))
+        self.assertIsNone(detect_format(b'<html>not an image</html>'))
+        self.assertIsNone(detect_format(b'RIFF\x00\x00\x00\x00WAVEfmt '))
+
+
+class RecompressTests(SimpleTestCase):
+
+    def test_exif_orientation_applied(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: повернуть на 90 градусов
+        data = make_image('JPEG', size=(40, 20), exif=exif.tobytes())
+
+        image, fmt = _recompress(data, 85, None, False)
+        self.assertEqual(fmt, 'JPEG')
+        with Image.open(io.BytesIO(image)) as img:
+            self.assertEqual(img.size, (20, 40))
+
+    def test_animated_webp_is_not_recompressed(self):
+        frames = [Image.new('RGB', (20, 20), color) for color in ('red', 'blue')]
+        buffer = io.BytesIO()
+        frames[0].save(buffer, format='WEBP', save_all=True, append_images=frames[1:], duration=100)
+        data = buffer.getvalue()
+
+        self.assertEqual(_recompress(data, 50, 10, False), (data, 'WEBP'))
+
+    def test_transparency_on_white_background(self):
+        data = make_image('PNG', mode='RGBA', color=(0, 0, 0, 0))
+        image, fmt = _recompress(data, 85, None, False)
+        with Image.open(io.BytesIO(image)) as img:
+            self.assertEqual(img.mode, 'RGB')
+            self.assertTrue(all(channel > 245 for channel in img.getpixel((5, 5))))
+
+    def test_max_size_and_webp(self):
+        image, fmt = _recompress(make_image('PNG', size=(400, 200)), 85, 100, True)
+        self.assertEqual(fmt, 'WEBP')
+        with Image.open(io.BytesIO(image)) as img:
+            self.assertEqual(img.size, (100, 50))
+
+
+@mock.patch.object(images, '_get_executor', return_value=None)  # пул потоков вместо процессов, чтобы подменить _recompress
+class KeepSmallerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.original = make_image('PNG')
+        self.data = {'filename': 'cat', 'size_bytes': len(self.original), 'image': self.original}
+
+    async def test_larger_result_keeps_original(self, _):
+        with mock.patch.object(images, '_recompress', return_value=(self.original + b'x', 'JPEG')):
+            result = await ImageProcessor().process(self.data)
+        self.assertIs(result['image'], self.original)
+        self.assertEqual(result['extension'], 'png')
+        self.assertEqual(result['original_size_bytes'], len(self.original))
+
+    async def test_smaller_result_replaces_original(self, _):
+        with mock.patch.object(images, '_recompress', return_value=(b'\xff\xd8\xff', 'JPEG')):
+            result = await ImageProcessor().process(self.data)
+        self.assertEqual(result['image'], b'\xff\xd8\xff')
+        self.assertEqual(result['size_bytes'], 3)
+        self.assertEqual(result['extension'], 'jpg')
+        self.assertEqual(result['original_size_bytes'], len(self.original))
+
+
+class ProcessPoolTests(SimpleTestCase):
+
+    async def test_recompress_in_process_pool(self):
+        buffer = io.BytesIO()
+        Image.frombytes('RGB', (200, 200), os.urandom(200 * 200 * 3)).save(buffer, format='PNG')
+        data = buffer.getvalue()
+
+        result = await ImageProcessor(quality=60).process({'filename': 'dog', 'size_bytes': len(data), 'image': data})
+        self.assertEqual(detect_format(result['image']), 'JPEG')
+        self.assertLess(result['size_bytes'], len(data))
+
+
+class ProcessingBudgetTests(SimpleTestCase):
+    """Обработка, не уложившаяся в свой бюджет, не съедает бюджет загрузки"""
+
+    async def test_originals_uploaded_after_processing_timeout(self):
+        async def slow_process_all(self, image_data):
+            await asyncio.sleep(5)
+
+        data = {'filename': 'cat', 'size_bytes': 4, 'image': b'\xff\xd8\xff\xe0'}
+        with tempfile.TemporaryDirectory() as root, override_settings(
+            ANIMALS_IMAGE_PROCESSING={'ENABLED': True, 'BUDGET': 0.2},
+            ANIMALS_UPLOAD_BUDGET=0.5,
+            ANIMALS_STORAGE_TARGETS=[{'BACKEND': 'local', 'ROOT': root}],
+        ), mock.patch.object(ImageProcessor, '_process_all', slow_process_all):
+            reports = await views._upload_to_targets(None, 'Cats', data)
+            self.assertEqual((Path(root) / 'Cats' / 'cat.jpg').read_bytes(), b'\xff\xd8\xff\xe0')
+
+        self.assertEqual(reports['local']['uploaded'], ['cat'])
+        self.assertTrue(reports['local']['json_uploaded'])
@@ -0,0 +1,55 @@
+import io
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.sessions.models import Session
+from django.core.management import CommandError, call_command
+from django.test import TransactionTestCase
+
+from animals.management.commands import loadtest
+
+
+class LoadtestCommandTests(TransactionTestCase):
+
+    def loadtest(self, *args) -> str:
+        out = io.StringIO()
+        # Один клиент: тестовая база в памяти (shared cache) не ждет блокировку таблицы, а сразу падает
+        call_command('loadtest', *args, '--concurrency', '1', '--repeat', '2', '--latency', '0',
+                     '--image-size', '1000', stdout=out)
+        return out.getvalue()
+
+    def mix(self, *lines) -> str:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = Path(directory.name) / 'mix.jsonl'
+        path.write_text('\n'.join(lines), encoding='utf-8')
+        return str(path)
+
+    def test_default_mix(self):
+        output = self.loadtest('--targets', 'local,s3')
+        self.assertIn('POST /dogs/upload/', output)
+        self.assertIn('Всего запросов: 16, ошибок: 0', output)
+        # Сессии клиентов удаляются после теста
+        self.assertEqual(Session.objects.count(), 0)
+
+    def test_redirect_without_result_is_error(self):
+        # Неизвестная порода - тот же редирект 302, но картинка в сессию не попадает
+        output = self.loadtest(self.mix(
+            '{"method": "POST", "path": "/dogs/get/", "data": {"breed": "nosuchdog"}}',
+            '{"method": "POST", "path": "/dogs/get/", "data": {"breed": "hound"}}',
+        ))
+        self.assertIn('Всего запросов: 4, ошибок: 2', output)
+
+    def test_failed_upload_is_error(self):
+        # Без токена загрузка на Яндекс Диск не выполняется, отчета в сессии нет
+        output = self.loadtest('--targets', 'yandex', self.mix(
+            '{"method": "POST", "path": "/cats/get/", "data": {"text": "hi", "path": "loadtest/Cats"}}',
+            '{"method": "POST", "path": "/cats/upload/"}',
+        ))
+        self.assertIn('Всего запросов: 4, ошибок: 2', output)
+
+    def test_unapplied_migrations(self):
+        with mock.patch.object(loadtest.MigrationExecutor, 'migration_plan', return_value=[('sessions', False)]):
+            with self.assertRaisesMessage(CommandError, 'migrate'):
+                self.loadtest()
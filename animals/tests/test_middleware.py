@@ -0,0 +1,143 @@
+import asyncio
+import pstats
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from AnimalBackupDjangoAPI.asgi import application
+from animals.middleware import CancelOnDisconnectMiddleware, ProfilingMiddleware
+from animals.services.breed_index import BreedIndex
+from animals.services.dogs import Dogs
+
+
+def profiled_view(request):
+    return HttpResponse(sum(range(1000)))
+
+
+class ProfilingMiddlewareTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.request = RequestFactory().get('/dogs/breeds/')
+
+    def middleware(self, **options):
+        options = {'ENABLED': True, 'DIR': self.directory, **options}
+        with override_settings(ANIMALS_PROFILING=options):
+            return ProfilingMiddleware(profiled_view)
+
+    def test_disabled(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            self.middleware(ENABLED=False)
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.middleware(ENGINE='perf')
+
+    def test_profile_saved_to_file(self):
+        response = self.middleware()(self.request)
+        self.assertEqual(response.content, b'499500')
+        files = list(self.directory.glob('*-GET-dogs_breeds-*ms-*.prof'))
+        self.assertEqual(len(files), 1)
+        self.assertTrue(pstats.Stats(str(files[0])).total_calls)
+
+    def test_sampling(self):
+        middleware = self.middleware(SAMPLE_RATE=0.5)
+        with mock.patch('animals.middleware.random.random', side_effect=[0.7, 0.2, 0.5]):
+            for _ in range(3):
+                self.assertEqual(middleware(self.request).status_code, 200)
+        self.assertEqual(len(list(self.directory.iterdir())), 1)
+
+    def test_skipped_when_profiler_busy(self):
+        middleware = self.middleware()
+        with mock.patch('animals.middleware.cProfile.Profile') as profile, \
+                self.assertLogs('animals.middleware', 'WARNING') as logs:
+            profile.return_value.enable.side_effect = ValueError('Another profiling tool is already active')
+            response = middleware(self.request)
+        self.assertEqual(response.content, b'499500')
+        self.assertIn('профилировщик уже занят', logs.output[0])
+        self.assertEqual(list(self.directory.iterdir()), [])
+
+
+def http_scope(method='GET', path='/'):
+    return {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': method, 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+        'query_string': b'', 'root_path': '',
+        'headers': [(b'host', b'testserver'), (b'content-type', b'application/x-www-form-urlencoded')],
+        'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+    }
+
+
+class CancelOnDisconnectTests(SimpleTestCase):
+
+    def setUp(self):
+        self.messages = asyncio.Queue()
+        self.sent = []
+
+    async def receive(self):
+        return await self.messages.get()
+
+    async def send(self, message):
+        self.sent.append(message)
+
+    async def test_disconnect_cancels_request(self):
+        cancelled = asyncio.Event()
+
+        async def app(scope, receive, send):
+            await receive()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        self.messages.put_nowait({'type': 'http.request', 'body': b''})
+        self.messages.put_nowait({'type': 'http.disconnect'})
+        await asyncio.wait_for(CancelOnDisconnectMiddleware(app)(http_scope(), self.receive, self.send), 1)
+        self.assertTrue(cancelled.is_set())
+        self.assertEqual(self.sent, [])
+
+    async def test_disconnect_after_response_is_ignored(self):
+        async def app(scope, receive, send):
+            await receive()
+            await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+            await send({'type': 'http.response.body', 'body': b'ok'})
+            # Сервер сообщает об отключении уже после ответа
+            self.messages.put_nowait({'type': 'http.disconnect'})
+            await asyncio.sleep(0.05)
+
+        self.messages.put_nowait({'type': 'http.request', 'body': b''})
+        await CancelOnDisconnectMiddleware(app)(http_scope(), self.receive, self.send)
+        self.assertEqual([message['type'] for message in self.sent], ['http.response.start', 'http.response.body'])
+
+    async def test_disconnect_cancels_dog_view(self):
+        """Отключение клиента отменяет запросы к dog.ceo внутри async-представления"""
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def slow_get_dog(breed, session, deadline=None, sub_breeds=None):
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        BreedIndex._instance = BreedIndex({'hound': ['afghan']})
+        self.addCleanup(BreedIndex.reset)
+        self.messages.put_nowait({'type': 'http.request', 'body': b'breed=hound'})
+
+        with mock.patch.object(Dogs, 'get_dog', slow_get_dog):
+            request = asyncio.create_task(application(http_scope('POST', '/dogs/get/'), self.receive, self.send))
+            await asyncio.wait_for(started.wait(), 5)
+            self.messages.put_nowait({'type': 'http.disconnect'})
+            await asyncio.wait_for(request, 5)
+
+        self.assertTrue(cancelled.is_set())
+        self.assertEqual(self.sent, [])
@@ -0,0 +1,142 @@
+import asyncio
+import os
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from animals.apps import _serves_requests
+from animals.services.breed_index import BreedIndex
+from animals.services.dogs import Dogs
+from animals.services.prefetch import DogPrefetcher
+
+IMAGE = b'\xff\xd8\xff\xe0' + b'\x00' * 59_996
+
+
+class DogPrefetcherTests(SimpleTestCase):
+    """Предзагрузка с подменой Dogs._get_image: считаем запросы к dog.ceo по породам"""
+
+    def setUp(self):
+        BreedIndex._instance = BreedIndex({'hound': ['afghan', 'basset'], 'pug': []})
+        self.addCleanup(BreedIndex.reset)
+        self.calls = Counter()
+        self.result = IMAGE
+
+    async def fake_get_image(self, breed, session):
+        self.calls[breed] += 1
+        await asyncio.sleep(0.05)
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+    def run_prefetcher(self, seconds: float, **options) -> DogPrefetcher:
+        options = {'breeds': ['hound'], 'refill_interval': 0.1, **options}
+        prefetcher = DogPrefetcher(**options)
+        with mock.patch.object(Dogs, '_get_image', self.fake_get_image):
+            prefetcher.start()
+            time.sleep(seconds)
+            alive = prefetcher.is_alive()
+            prefetcher.stop()
+        self.assertTrue(alive)
+        return prefetcher
+
+    def test_buffers_filled(self):
+        prefetcher = self.run_prefetcher(0.5, buffer_size=2)
+        self.assertEqual(set(self.calls), {'hound', 'hound/afghan', 'hound/basset'})
+        self.assertEqual([len(prefetcher._buffers[key]) for key in self.calls], [2, 2, 2])
+        self.assertEqual(prefetcher._bytes, 6 * len(IMAGE))
+        self.assertEqual(prefetcher._reserved, 0)
+
+    def test_max_bytes_reserved_before_download(self):
+        # В 100 КБ помещается одна картинка: вторая не скачивается, а не отбрасывается после загрузки
+        prefetcher = self.run_prefetcher(0.5, buffer_size=3, max_bytes=100_000)
+        self.assertEqual(sum(self.calls.values()), 1)
+        self.assertEqual(prefetcher._bytes, len(IMAGE))
+        self.assertLessEqual(prefetcher._bytes + prefetcher._reserved, 100_000)
+
+    def test_failing_breed_backoff(self):
+        self.result = None
+        prefetcher = self.run_prefetcher(1.0, breeds=['pug'])
+        # Задержки 0.2, 0.4, 0.8 с: за секунду не больше 4 попыток вместо 10
+        self.assertLessEqual(self.calls['pug'], 4)
+        self.assertGreaterEqual(prefetcher._failures['pug'], 2)
+        self.assertEqual(prefetcher._reserved, 0)
+
+    def test_unexpected_error_does_not_stop_prefetcher(self):
+        self.result = KeyError('message')
+        with self.assertLogs('animals.services.prefetch', 'ERROR'):
+            prefetcher = self.run_prefetcher(0.5, breeds=['pug'])
+        self.assertGreaterEqual(prefetcher._failures['pug'], 1)
+        self.assertEqual(prefetcher._reserved, 0)
+
+
+class DogPrefetcherDiskTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+
+    async def test_process_subdirectory(self):
+        other = self.root / '1' / 'hound-other.img'
+        other.parent.mkdir()
+        other.write_bytes(IMAGE)
+
+        prefetcher = DogPrefetcher(['hound'], directory=str(self.root))
+        self.assertEqual(prefetcher.directory, self.root / str(os.getpid()))
+        # Файлы другого процесса не удаляются
+        self.assertTrue(other.exists())
+
+        self.assertTrue(prefetcher._store('hound', IMAGE, 0))
+        [path] = prefetcher.directory.iterdir()
+        self.assertEqual(await prefetcher.take('hound'), IMAGE)
+        self.assertFalse(path.exists())
+        self.assertEqual(prefetcher._bytes, 0)
+
+        prefetcher.stop()
+        self.assertFalse(prefetcher.directory.exists())
+        self.assertTrue(other.exists())
+
+
+class PrefetchFallbackTests(SimpleTestCase):
+
+    def setUp(self):
+        self.prefetcher = DogPrefetcher(['hound'])
+        patcher = mock.patch.object(Dogs, 'prefetcher', self.prefetcher)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_empty_buffer_falls_back_to_api(self):
+        with mock.patch.object(Dogs, '_get_image', mock.AsyncMock(return_value=b'from api')) as get_image:
+            self.assertEqual(await Dogs._get_prefetched_image('hound', None), b'from api')
+        get_image.assert_awaited_once_with('hound', None)
+
+    async def test_buffered_image_used(self):
+        self.prefetcher._store('hound', IMAGE, 0)
+        with mock.patch.object(Dogs, '_get_image', mock.AsyncMock()) as get_image:
+            self.assertEqual(await Dogs._get_prefetched_image('hound', None), IMAGE)
+            self.assertEqual(await Dogs._get_prefetched_image('hound', None), get_image.return_value)
+        get_image.assert_awaited_once()
+
+
+class ServesRequestsTests(SimpleTestCase):
+    """AnimalsConfig.ready() запускает предзагрузку только в процессах, обслуживающих запросы"""
+
+    def test_commands(self):
+        cases = [
+            (['/usr/bin/uvicorn', 'AnimalBackupDjangoAPI.asgi:application'], {}, True),
+            (['manage.py', 'migrate'], {}, False),
+            (['manage.py', 'test', 'animals'], {}, False),
+            (['manage.py', 'runserver'], {}, False),
+            (['manage.py', 'runserver'], {'RUN_MAIN': 'true'}, True),
+            (['manage.py', 'runserver', '--noreload'], {}, True),
+        ]
+        for argv, environ, expected in cases:
+            with self.subTest(argv=argv, environ=environ), mock.patch('sys.argv', argv), \
+                    mock.patch.dict(os.environ, environ):
+                if not environ:
+                    os.environ.pop('RUN_MAIN', None)
+                self.assertIs(_serves_requests(), expected)
@@ -0,0 +1,157 @@
+import asyncio
+import hashlib
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from animals.management.commands.loadtest import UpstreamStandIn
+from animals.services.storage import LocalStorage, S3Storage, upload_to_all
+from animals.services.yandex_disk import YandexDiskFileManager
+
+
+class FixedDatetime(datetime):
+    """datetime.now() с фиксированным временем для проверки подписи"""
+    @classmethod
+    def now(cls, tz=None):
+        return datetime(2026, 10, 19, 12, 0, 0, tzinfo=timezone.utc)
+
+
+class S3SignTests(SimpleTestCase):
+    """Подпись AWS Signature V4 сверена с botocore для тех же входных данных"""
+
+    def setUp(self):
+        self.storage = S3Storage(
+            'http://127.0.0.1:9000', 'animals',
+            'AKIDEXAMPLE', 'wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY',
+        )
+        self.payload_hash = hashlib.sha256(b'hello').hexdigest()
+
+    def _sign(self, path):
+        with mock.patch('animals.services.storage.datetime', FixedDatetime):
+            return self.storage._sign('PUT', path, self.payload_hash)
+
+    def test_ascii_key(self):
+        headers = self._sign('/animals/loadtest/Dogs/hound.jpg')
+        self.assertEqual(headers['x-amz-date'], '20261019T120000Z')
+        self.assertEqual(headers['x-amz-content-sha256'], self.payload_hash)
+        self.assertEqual(
+            headers['Authorization'],
+            'AWS4-HMAC-SHA256 Credential=AKIDEXAMPLE/20261019/us-east-1/s3/aws4_request, '
+            'SignedHeaders=host;x-amz-content-sha256;x-amz-date, '
+            'Signature=bbfe9e953ca8e922e8ffa204a664bfe856cd29ec50fbd87975773d0cd7c1fffd'
+        )
+
+    def test_cyrillic_and_punctuation_key(self):
+        headers = self._sign(
+            '/animals/pd-fpy_138/Cats/'
+            '%D0%94%D0%BE%D0%B1%D1%80%D0%BE%D0%B5%20%D1%83%D1%82%D1%80%D0%BE%21%20%281%29%27%2A.jpg'
+        )
+        self.assertTrue(headers['Authorization'].endswith(
+            'Signature=a88b13385b22d29ea2e39324be4408321db10b51cd9b597b6875af725e839c5c'
+        ))
+
+    def test_host_without_default_port(self):
+        # aiohttp не отправляет порт по умолчанию в заголовке Host, подпись должна с ним совпадать
+        self.assertEqual(S3Storage('https://storage.yandexcloud.net:443', 'b', 'a', 's').host,
+                         'storage.yandexcloud.net')
+        self.assertEqual(S3Storage('http://minio:80/', 'b', 'a', 's').host, 'minio')
+        self.assertEqual(S3Storage('https://minio:9000', 'b', 'a', 's').host, 'minio:9000')
+        self.assertEqual(S3Storage('http://[::1]:9000', 'b', 'a', 's').host, '[::1]:9000')
+
+
+class LocalStorageTests(SimpleTestCase):
+
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.root.cleanup)
+        self.storage = LocalStorage(self.root.name)
+
+    def test_resolve_inside_root(self):
+        self.assertEqual(self.storage._resolve('Dogs/hound'), Path(self.root.name).resolve() / 'Dogs' / 'hound')
+
+    def test_resolve_rejects_parent_directory(self):
+        self.assertIsNone(self.storage._resolve('../outside'))
+        self.assertIsNone(self.storage._resolve('Dogs/../../outside'))
+
+    async def test_upload_outside_root_is_failed(self):
+        self.assertFalse(await self.storage.create_folder('../outside'))
+        self.assertFalse(await self.storage._upload_bytes('Dogs', '../../outside.jpg', b'data'))
+
+
+class UploadDataTests(SimpleTestCase):
+    """Загрузка через StorageBackend.upload_data в заглушку Яндекс Диска из loadtest"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.upstream = UpstreamStandIn(latency=0.2, image_size=1000)
+        cls.upstream.start()
+        cls.upstream.ready.wait()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.upstream.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        patcher = mock.patch.object(YandexDiskFileManager, 'base_url', f'{self.upstream.url}/disk')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.data = {
+            'hound': {
+                'filename': 'hound', 'size_bytes': 4, 'image': b'\xff\xd8\xff\xe0',
+                'sub_breeds': {
+                    'afghan': {'filename': 'hound_afghan', 'size_bytes': 4, 'image': b'\x89PNG\r\n\x1a\n'},
+                },
+            },
+        }
+
+    async def test_success(self):
+        async with YandexDiskFileManager('token') as yd:
+            report = await yd.upload_data('Dogs', self.data)
+        self.assertCountEqual(report['uploaded'], ['hound', 'hound_afghan'])
+        self.assertEqual(report['failed'], [])
+        self.assertTrue(report['json_uploaded'])
+        self.assertGreater(report['bytes'], 8)
+
+    async def test_failed_uploads_are_reported(self):
+        with mock.patch.object(YandexDiskFileManager, 'base_url', f'{self.upstream.url}/missing'):
+            async with YandexDiskFileManager('token') as yd:
+                report = await yd.upload_data('Dogs', self.data)
+        self.assertEqual(report['uploaded'], [])
+        self.assertCountEqual(report['failed'], ['hound', 'hound_afghan'])
+        self.assertFalse(report['json_uploaded'])
+
+    async def test_deadline_cancels_uploads(self):
+        deadline = asyncio.get_running_loop().time() + 0.1
+        async with YandexDiskFileManager('token') as yd:
+            report = await yd.upload_data('Dogs', self.data, deadline)
+        self.assertEqual(report['uploaded'], [])
+        self.assertCountEqual(report['failed'], ['hound', 'hound_afghan'])
+        self.assertFalse(report['json_uploaded'])
+        self.assertLess(report['seconds'], 0.2)
+
+    async def test_failing_target_does_not_abort_others(self):
+        class BrokenStorage(LocalStorage):
+            name = 'broken'
+
+            async def create_folder(self, folder_path, deadline=None):
+                raise RuntimeError('диск недоступен')
+
+        with tempfile.TemporaryDirectory() as root:
+            reports = await upload_to_all(
+                [BrokenStorage(root), LocalStorage(root), YandexDiskFileManager('token')], 'Dogs', self.data
+            )
+            self.assertTrue((Path(root) / 'Dogs' / 'hound_afghan.png').exists())
+
+        self.assertFalse(reports['broken']['json_uploaded'])
+        self.assertCountEqual(reports['broken']['failed'], ['hound', 'hound_afghan'])
+        self.assertCountEqual(reports['local']['uploaded'], ['hound', 'hound_afghan'])
+        self.assertCountEqual(reports['yandex']['uploaded'], ['hound', 'hound_afghan'])
+
+    async def test_duplicate_target_names_rejected(self):
+        with self.assertRaises(ValueError):
+            await upload_to_all([LocalStorage('a'), LocalStorage('b')], 'Dogs', self.data)
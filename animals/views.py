@@ -1,11 +1,158 @@
+import asyncio
 import base64
 import aiohttp
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import JsonResponse
 from django.shortcuts import render, redirect
+from django.views.decorators.cache import cache_control, cache_page
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET
 from animals.services.cats import Cats
 from animals.services.dogs import Dogs
+from animals.services.breed_index import BreedIndex
+from animals.services import images
+from animals.services.images import ImageProcessor
+from animals.services.storage import LocalStorage, S3Storage, upload_to_all
 from animals.services.yandex_disk import YandexDiskFileManager
-from asgiref.sync import async_to_sync
+from asgiref.sync import async_to_sync, sync_to_async
+
+
+def _deadline(budget: float) -> float:
+    """
+    Момент времени event loop, до которого должен уложиться запрос.
+    Вызывается внутри корутины
+    """
+    return asyncio.get_running_loop().time() + budget
+
+
+def _image_processor():
+    """
+    Обработчик картинок перед загрузкой по настройкам ANIMALS_IMAGE_PROCESSING.
+    Возвращает None, если обработка выключена
+    """
+    options = settings.ANIMALS_IMAGE_PROCESSING
+    if not options.get('ENABLED'):
+        return None
+    if images.Image is None:
+        raise ImproperlyConfigured("Для ANIMALS_IMAGE_PROCESSING['ENABLED'] установите Pillow")
+    return ImageProcessor(
+        quality=options.get('QUALITY', 85),
+        max_size=options.get('MAX_SIZE'),
+        to_webp=options.get('WEBP', False),
+    )
+
+
+def _storage_targets(token: str | None) -> list:
+    """
+    Места хранения резервных копий по настройкам ANIMALS_STORAGE_TARGETS
+    """
+    targets = []
+    for options in settings.ANIMALS_STORAGE_TARGETS:
+        backend = options['BACKEND']
+        if backend == 'yandex':
+            target = YandexDiskFileManager(token)
+        elif backend == 'local':
+            target = LocalStorage(options['ROOT'])
+        elif backend == 's3':
+            target = S3Storage(
+                endpoint_url=options['ENDPOINT_URL'],
+                bucket=options['BUCKET'],
+                access_key=options['ACCESS_KEY'],
+                secret_key=options['SECRET_KEY'],
+                region=options.get('REGION', 'us-east-1'),
+            )
+        else:
+            raise ImproperlyConfigured(f"Неизвестное место хранения: {backend}")
+        target.name = options.get('NAME', backend)
+        if any(other.name == target.name for other in targets):
+            raise ImproperlyConfigured(
+                f"Место хранения {target.name} указано дважды, задайте разные NAME в ANIMALS_STORAGE_TARGETS"
+            )
+        targets.append(target)
+    return targets
+
+
+def _token_required() -> bool:
+    """Нужен ли OAuth-токен: только если среди мест хранения есть Яндекс Диск"""
+    return any(options['BACKEND'] == 'yandex' for options in settings.ANIMALS_STORAGE_TARGETS)
+
+
+def _upload_success(upload_reports: dict | None) -> bool:
+    """Все файлы и метаданные загружены во все места хранения"""
+    return bool(upload_reports) and all(
+        not report['failed'] and report['json_uploaded'] for report in upload_reports.values()
+    )
+
+
+def _async_csrf_exempt(view):
+    """
+    csrf_exempt для async-представлений: в Django 4.2 csrf_exempt оборачивает
+    представление в синхронную функцию, и Django перестает считать его асинхронным
+    """
+    view.csrf_exempt = True
+    return view
+
+
+def _session_values(session, **defaults) -> dict:
+    """
+    Значения из сессии (ключ - значение по умолчанию).
+    Сессия читается из базы синхронно, поэтому async-представления вызывают это через sync_to_async
+    """
+    return {key: session.get(key, default) for key, default in defaults.items()}
+
+
+def _save_dog_data(session, breed: str, data: dict):
+    """
+    Сохраняет полученные картинки породы и подпород в сессию (в base64).
+    Синхронная: вызывается из get_dog_image через sync_to_async
+    """
+    # Основная порода
+    main_data = data[breed]
+    main_b64 = base64.b64encode(main_data['image']).decode('utf-8')
+    session['dog_main_image'] = main_b64
+    session['dog_main_bytes_for_upload'] = main_b64
+    session['dog_main_filename'] = main_data['filename']
+
+    # Подпороды
+    sub_images = {}
+    if 'sub_breeds' in main_data:
+        for subname, subdata in main_data['sub_breeds'].items():
+            sub_b64 = base64.b64encode(subdata['image']).decode('utf-8')
+            sub_images[subname] = sub_b64
+    session['dog_sub_images'] = sub_images
+    session['dog_failed_sub_breeds'] = main_data.get('failed_sub_breeds', [])
+    session['dog_sub_breeds_partial'] = main_data.get('partial', False)
+
+    # Сохраняем весь словарь данных в base64 для загрузки
+    dog_raw_data = {}
+    for k, v in data.items():
+        dog_raw_data[k] = {'filename': v['filename'],
+                           'size_bytes': len(v['image']),
+                           'image': base64.b64encode(v['image']).decode('utf-8')}
+        if 'sub_breeds' in v:
+            dog_raw_data[k]['sub_breeds'] = {}
+            for sk, sv in v['sub_breeds'].items():
+                dog_raw_data[k]['sub_breeds'][sk] = {
+                    'filename': sv['filename'],
+                    'size_bytes': len(sv['image']),
+                    'image': base64.b64encode(sv['image']).decode('utf-8')
+                }
+
+    session['dog_raw_data_for_upload'] = dog_raw_data
+
+
+async def _upload_to_targets(token: str | None, path: str, data: dict) -> dict:
+    """
+    Обрабатывает картинки в пределах ANIMALS_IMAGE_PROCESSING['BUDGET'] и загружает их
+    во все места хранения в пределах ANIMALS_UPLOAD_BUDGET.
+    Бюджет загрузки отсчитывается после обработки: если обработка не уложилась
+    в свой бюджет, исходные картинки успевают загрузиться
+    """
+    processor = _image_processor()
+    if processor:
+        data = await processor.process_all(data, _deadline(settings.ANIMALS_IMAGE_PROCESSING.get('BUDGET', 15)))
+    return await upload_to_all(_storage_targets(token), path, data, _deadline(settings.ANIMALS_UPLOAD_BUDGET))
 
 
 def index(request):
@@ -47,15 +194,18 @@ def cats_page(request):
     saved_cat = request.session.get('cat_image')   # bytes в base64
     saved_text = request.session.get('cat_text', '')
     saved_path = request.session.get('cat_path', 'pd-fpy_138/Cats')
+    upload_reports = request.session.pop('cat_upload_reports', None)
 
     return render(request, 'animals/cats.html', {
         'image_b64': saved_cat,
         'text_value': saved_text,
-        'path_value': saved_path
+        'path_value': saved_path,
+        'upload_reports': upload_reports,
+        'upload_success': _upload_success(upload_reports),
     })
 
-@csrf_exempt
-def get_cat_image(request):
+@_async_csrf_exempt
+async def get_cat_image(request):
     """
     Принимает текст, запрашивает кота у API cataas.com,
     """
@@ -63,36 +213,39 @@ def get_cat_image(request):
         text = request.POST.get('text', '').strip()
         path = request.POST.get('path', 'pd-fpy_138/Cats').strip()
 
-        request.session['cat_text'] = text
-        request.session['cat_path'] = path
+        await sync_to_async(request.session.update)({'cat_text': text, 'cat_path': path})
 
         if not text:
             return redirect('cats_page')
 
-        result = async_to_sync(Cats.get_cat_with_text)(text)
+        result = await Cats.get_cat_with_text(text)
         if result is None:
             return redirect('cats_page')
 
         image_b64 = base64.b64encode(result['image']).decode('utf-8')
-        request.session['cat_image'] = image_b64
-        request.session['cat_image_b64_for_upload'] = image_b64
-        request.session['cat_filename'] = result['filename']
+        await sync_to_async(request.session.update)({
+            'cat_image': image_b64,
+            'cat_image_b64_for_upload': image_b64,
+            'cat_filename': result['filename'],
+        })
 
     return redirect('cats_page')
 
-@csrf_exempt
-def upload_cat_to_disk(request):
+@_async_csrf_exempt
+async def upload_cat_to_disk(request):
     """
-    Загружает сохраненную картинку на Яндекс Диск
+    Загружает сохраненную картинку во все места хранения (ANIMALS_STORAGE_TARGETS)
     """
     if request.method == 'POST':
-
-        token = request.session.get('yadisk_token')
-        image_b64 = request.session.get('cat_image_b64_for_upload')
-        filename = request.session.get('cat_filename')
-        path = request.session.get('cat_path', 'pd-fpy_138/Cats')
-
-        if not (token and image_b64 and filename):
+        values = await sync_to_async(_session_values)(
+            request.session,
+            yadisk_token=None, cat_image_b64_for_upload=None, cat_filename=None, cat_path='pd-fpy_138/Cats',
+        )
+        token = values['yadisk_token']
+        image_b64 = values['cat_image_b64_for_upload']
+        filename = values['cat_filename']
+
+        if not (image_b64 and filename) or (_token_required() and not token):
             return redirect('cats_page')
 
         image_bytes = base64.b64decode(image_b64)
@@ -102,101 +255,108 @@ def upload_cat_to_disk(request):
             'image': image_bytes,
         }
 
-        async def upload_task():
-            async with YandexDiskFileManager(token) as yd:
-                await yd.create_folder(path)
-                await yd.upload_data(path, data)
-
-        async_to_sync(upload_task)()
+        upload_reports = await _upload_to_targets(token, values['cat_path'], data)
+        await sync_to_async(request.session.__setitem__)('cat_upload_reports', upload_reports)
 
     return redirect('cats_page')
 
 def dogs_page(request):
     """
-    Форма для собак
+    Форма для собак.
+    Список пород не рендерится в страницу, а подгружается через breeds_autocomplete
     """
-    breeds = async_to_sync(Dogs.get_all_breeds)() or []
-
     saved_breed = request.session.get('dog_breed', '')
     saved_path = request.session.get('dog_path', 'pd-fpy_138/Dogs')
     main_b64 = request.session.get('dog_main_image')
     sub_images = request.session.get('dog_sub_images', {})
+    failed_sub_breeds = request.session.get('dog_failed_sub_breeds', [])
+    sub_breeds_partial = request.session.get('dog_sub_breeds_partial', False)
+    upload_reports = request.session.pop('dog_upload_reports', None)
+    error = request.session.pop('dog_error', None)
 
     return render(request, 'animals/dogs.html', {
-        'breeds': breeds,
+        'error': error,
         'selected_breed': saved_breed,
         'image_b64': main_b64,
         'path_value': saved_path,
         'sub_images': sub_images,
+        'failed_sub_breeds': failed_sub_breeds,
+        'sub_breeds_partial': sub_breeds_partial,
+        'upload_reports': upload_reports,
+        'upload_success': _upload_success(upload_reports),
     })
 
-@csrf_exempt
-def get_dog_image(request):
+@require_GET
+@cache_control(public=True)
+@cache_page(60 * 60)
+def breeds_autocomplete(request):
+    """
+    Поиск пород для автодополнения.
+    GET-параметры:
+    - q: строка поиска (префикс или подстрока)
+    - limit: максимальное количество результатов
+    """
+    index = async_to_sync(BreedIndex.get)()
+    if index is None:
+        return JsonResponse({'results': []}, status=503)
+
+    query = request.GET.get('q', '')
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 20)), 200))
+    except ValueError:
+        limit = 20
+
+    return JsonResponse({'results': index.search(query, limit)})
+
+@_async_csrf_exempt
+async def get_dog_image(request):
     """
     Получает картинки основной породы и подпород
     """
     if request.method == 'POST':
-        breed = request.POST.get('breed')
+        breed = request.POST.get('breed', '').strip().lower()
         if not breed:
             return redirect('dogs_page')
 
-        path = f'pd-fpy_138/Dogs/{breed}'
-        request.session['dog_breed'] = breed
-        request.session['dog_path'] = path
+        index = await BreedIndex.get()
+        if index is not None and breed not in index:
+            await sync_to_async(request.session.__setitem__)(
+                'dog_error', f"Порода «{breed}» не найдена, выберите породу из списка"
+            )
+            return redirect('dogs_page')
+        # Подпороды берем из индекса, без индекса get_dog запросит их у API
+        sub_breeds = index.sub_breeds[breed] if index is not None else None
 
-        async def fetch_dog_data():
-            async with aiohttp.ClientSession() as session:
-                return await Dogs.get_dog(breed, session)
+        path = f'pd-fpy_138/Dogs/{breed}'
+        await sync_to_async(request.session.update)({'dog_breed': breed, 'dog_path': path})
 
-        data = async_to_sync(fetch_dog_data)()
+        deadline = _deadline(settings.ANIMALS_FETCH_BUDGET)
+        async with aiohttp.ClientSession() as session:
+            data = await Dogs.get_dog(breed, session, deadline, sub_breeds)
         if data is None:
+            await sync_to_async(request.session.__setitem__)(
+                'dog_error', f"Не удалось получить картинку породы «{breed}», попробуйте еще раз"
+            )
             return redirect('dogs_page')
 
-        # Основная порода
-        main_data = data[breed]
-        main_b64 = base64.b64encode(main_data['image']).decode('utf-8')
-        request.session['dog_main_image'] = main_b64
-        request.session['dog_main_bytes_for_upload'] = main_b64
-        request.session['dog_main_filename'] = main_data['filename']
-
-        # Подпороды
-        sub_images = {}
-        if 'sub_breeds' in main_data:
-            for subname, subdata in main_data['sub_breeds'].items():
-                sub_b64 = base64.b64encode(subdata['image']).decode('utf-8')
-                sub_images[subname] = sub_b64
-        request.session['dog_sub_images'] = sub_images
-
-        # Сохраняем весь словарь данных в base64 для загрузки
-        dog_raw_data = {}
-        for k, v in data.items():
-            dog_raw_data[k] = {'filename': v['filename'],
-                               'size_bytes': len(v['image']),
-                               'image': base64.b64encode(v['image']).decode('utf-8')}
-            if 'sub_breeds' in v:
-                dog_raw_data[k]['sub_breeds'] = {}
-                for sk, sv in v['sub_breeds'].items():
-                    dog_raw_data[k]['sub_breeds'][sk] = {
-                        'filename': sv['filename'],
-                        'size_bytes': len(sv['image']),
-                        'image': base64.b64encode(sv['image']).decode('utf-8')
-                    }
-
-        request.session['dog_raw_data_for_upload'] = dog_raw_data
+        await sync_to_async(_save_dog_data)(request.session, breed, data)
 
     return redirect('dogs_page')
 
-@csrf_exempt
-def upload_dog_to_disk(request):
+@_async_csrf_exempt
+async def upload_dog_to_disk(request):
     """
-    Загружает основную породу и подпороды на Яндекс Диск.
+    Загружает основную породу и подпороды во все места хранения (ANIMALS_STORAGE_TARGETS).
     """
     if request.method == 'POST':
-        token = request.session.get('yadisk_token')
-        path = request.session.get('dog_path', 'pd-fpy_138/Dogs')
-        raw_data_b64 = request.session.get('dog_raw_data_for_upload')
-
-        if not (token and raw_data_b64):
+        values = await sync_to_async(_session_values)(
+            request.session,
+            yadisk_token=None, dog_path='pd-fpy_138/Dogs', dog_raw_data_for_upload=None,
+        )
+        token = values['yadisk_token']
+        raw_data_b64 = values['dog_raw_data_for_upload']
+
+        if not raw_data_b64 or (_token_required() and not token):
             return redirect('dogs_page')
 
         raw_data_bytes = {}
@@ -213,11 +373,7 @@ def upload_dog_to_disk(request):
                         'image': base64.b64decode(sv['image'])
                     }
 
-        async def upload_task():
-            async with YandexDiskFileManager(token) as yd:
-                await yd.create_folder(path)
-                await yd.upload_data(path, raw_data_bytes)
+        upload_reports = await _upload_to_targets(token, values['dog_path'], raw_data_bytes)
+        await sync_to_async(request.session.__setitem__)('dog_upload_reports', upload_reports)
 
-        async_to_sync(upload_task)()
-
-    return redirect('dogs_page')
\ No newline at end of file
+    return redirect('dogs_page')